@@ -1,19 +1,21 @@
 import os
+import re
 import json
-import google.generativeai as genai
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+import llm_cache
+from llm_client import get_client
 
 # --- Configuration ---
-api_key = None
-IS_CONFIGURED = False
-try:
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    if api_key:
-        genai.configure(api_key=api_key)
-        IS_CONFIGURED = True
-    else:
-        print("WARNING: GOOGLE_API_KEY not found. AI agent will use fallback responses.")
-except Exception as e:
-    print(f"ERROR: Failed to configure Gemini API, will use fallback. Details: {e}")
+# google.generativeai is only imported when the first LLM call builds the
+# shared client (see llm_client.GeminiBackend).
+MODEL_NAME = 'gemini-1.0-pro'
+api_key = os.environ.get("GOOGLE_API_KEY")
+IS_CONFIGURED = bool(api_key)
+if not IS_CONFIGURED:
+    print("WARNING: GOOGLE_API_KEY not found. AI agent will use fallback responses.")
 
 MOCK_AI_RESPONSE = """
 [Mock AI Analysis]: This feedback highlights a critical user issue requiring immediate attention. 
@@ -21,15 +23,126 @@ The user expresses significant frustration, which poses a risk to customer satis
 Recommended Action: Escalate this ticket to a senior support agent for direct follow-up within the next hour to mitigate potential churn.
 """
 
+MOCK_THEMES = ["App Performance", "Login Issues", "UI Feedback", "Feature Request"]
+FALLBACK_THEMES = ["App Performance", "Login Issues", "UI Feedback"]
+
+def active_model_name() -> str:
+    """Name used in cache keys; the mock fallback gets its own namespace."""
+    return MODEL_NAME if IS_CONFIGURED else "mock"
+
 def get_agent_recommendation(feedback_text):
+    model_name = active_model_name()
+    cached = llm_cache.get(model_name, f"recommendation\0{feedback_text}")
+    if cached is not None:
+        return cached
     if not IS_CONFIGURED:
-        return MOCK_AI_RESPONSE
-    try:
-        model = genai.GenerativeModel('gemini-1.0-pro')
-        prompt = f"""As an expert customer support analyst, analyze the following feedback and provide a concise, one-paragraph recommendation with an analysis and a suggested action. Feedback: "{feedback_text}" Recommendation:"""
-        response = model.generate_content(prompt)
-        return response.text if response.parts else MOCK_AI_RESPONSE
-    except Exception as e:
-        print(f"GEMINI API ERROR during generation: {e}")
-        return MOCK_AI_RESPONSE
+        recommendation = MOCK_AI_RESPONSE
+    else:
+        try:
+            prompt = f"""As an expert customer support analyst, analyze the following feedback and provide a concise, one-paragraph recommendation with an analysis and a suggested action. Feedback: "{feedback_text}" Recommendation:"""
+            recommendation = get_client(MODEL_NAME).generate(prompt)
+        except Exception as e:
+            print(f"GEMINI API ERROR during generation: {e}")
+            return MOCK_AI_RESPONSE
+    llm_cache.put(model_name, f"recommendation\0{feedback_text}", recommendation)
+    return recommendation
+
+def _recommend_batch(items: list) -> dict:
+    """Asks for recommendations for several (id, text) items in one prompt; returns {id: text}."""
+    feedback_block = json.dumps([{"id": feedback_id, "feedback": text} for feedback_id, text in items], ensure_ascii=False)
+    prompt = f"""As an expert customer support analyst, analyze each of the following feedback items and provide a concise, one-paragraph recommendation with an analysis and a suggested action for each. Return ONLY a valid JSON array with one object per item, in the form {{"id": <id>, "recommendation": "<text>"}}. Feedback items:\n{feedback_block}\n\nJSON Response:"""
+    response_text = get_client(MODEL_NAME).generate(prompt)
+    cleaned_response = re.sub(r'```json\n?|```', '', response_text.strip())
+    parsed = json.loads(cleaned_response)
+    wanted = {feedback_id for feedback_id, _ in items}
+    return {
+        int(entry["id"]): str(entry["recommendation"]).strip()
+        for entry in parsed
+        if isinstance(entry, dict) and entry.get("recommendation") and str(entry.get("id")).isdigit() and int(entry["id"]) in wanted
+    }
+
+def get_agent_recommendations_bulk(items: list, batch_size: int = None, budget_seconds: float = None) -> tuple:
+    """
+    Generates recommendations for many feedback items, several per LLM call.
+
+    Args:
+        items: List of (feedback_id, feedback_text) pairs.
+        batch_size: Items packed into one prompt (defaults to LLM_BULK_BATCH_SIZE).
+        budget_seconds: Wall-clock limit (defaults to LLM_BULK_BUDGET_SECONDS).
+            A batch only starts while a full LLM_TIMEOUT_SECONDS call still
+            fits, so the whole run ends within the budget.
 
+    Returns:
+        ({feedback_id: recommendation}, stats). Items the model skipped, whose
+        batch failed or that did not fit in the budget are left out so they
+        can be retried later. stats has llm_calls, failed_calls,
+        deferred_calls, wall_seconds and estimated_per_item_seconds (call
+        latency x items, i.e. the one-call-per-item path).
+    """
+    batch_size = batch_size or config.LLM_BULK_BATCH_SIZE
+    budget_seconds = config.LLM_BULK_BUDGET_SECONDS if budget_seconds is None else budget_seconds
+    stats = {"llm_calls": 0, "failed_calls": 0, "deferred_calls": 0, "wall_seconds": 0.0, "estimated_per_item_seconds": 0.0}
+    if not IS_CONFIGURED:
+        return {feedback_id: MOCK_AI_RESPONSE for feedback_id, _ in items}, stats
+
+    def run(batch):
+        if time.perf_counter() - started + config.LLM_TIMEOUT_SECONDS > budget_seconds:
+            return None, 0.0, None
+        call_started = time.perf_counter()
+        try:
+            return _recommend_batch(batch), time.perf_counter() - call_started, None
+        except Exception as e:
+            return {}, time.perf_counter() - call_started, e
+
+    started = time.perf_counter()
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    results = {}
+    call_seconds = []
+    with ThreadPoolExecutor(max_workers=config.LLM_MAX_CONCURRENCY) as pool:
+        for recommendations, elapsed, error in pool.map(run, batches):
+            if recommendations is None:
+                stats["deferred_calls"] += 1
+                continue
+            stats["llm_calls"] += 1
+            if error is not None:
+                stats["failed_calls"] += 1
+                print(f"GEMINI BULK GENERATION ERROR: {error}")
+                continue
+            call_seconds.append(elapsed)
+            results.update(recommendations)
+    stats["wall_seconds"] = round(time.perf_counter() - started, 3)
+    if call_seconds:
+        stats["estimated_per_item_seconds"] = round(sum(call_seconds) / len(call_seconds) * len(items), 3)
+    return results, stats
+
+def get_feedback_themes(user_id, all_feedback_texts: list) -> list:
+    """
+    Extract common themes from feedback texts using the AI agent.
+
+    Results are cached per user and prompt input; ingestion drops the user's
+    cached themes when new feedback arrives.
+    """
+    if len(all_feedback_texts) < 5: # Require a minimum amount of data
+        return MOCK_THEMES
+    model_name = active_model_name()
+    # Use a sample of feedback to avoid overly large prompts
+    feedback_block = "\n".join(f"- {text}" for text in all_feedback_texts[:50])
+    cached = llm_cache.get(model_name, f"themes\0{feedback_block}")
+    if cached is not None:
+        return cached
+    if not IS_CONFIGURED:
+        themes = MOCK_THEMES
+    else:
+        try:
+            prompt = f"""Analyze the following customer feedback. Identify the 3-5 most common themes. Return ONLY a valid JSON array of strings. Example: ["Login Problems", "UI Suggestions", "Payment Failures"]. Feedback:\n{feedback_block}\n\nJSON Response:"""
+            response_text = get_client(MODEL_NAME).generate(prompt)
+            # Clean the response to ensure it is valid JSON
+            cleaned_response = re.sub(r'```json\n?|```', '', response_text.strip())
+            themes = json.loads(cleaned_response)
+            if not isinstance(themes, list):
+                return ["AI Error: Invalid Format"]
+        except Exception as e:
+            print(f"GEMINI THEME EXTRACTION ERROR: {e}")
+            return FALLBACK_THEMES
+    llm_cache.put(model_name, f"themes\0{feedback_block}", themes, tag=llm_cache.themes_tag(user_id))
+    return themes
@@ -1,12 +1,9 @@
 import os
-import re
-import csv
-import io
-import json
-from datetime import datetime, timedelta
-from collections import Counter
-
-from flask import Flask, request, jsonify, render_template
+import time
+import uuid
+from datetime import datetime
+
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
@@ -15,51 +12,92 @@ from sqlalchemy.orm import Session
 # Correctly load the .env file from the project's root directory
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
+import config
 from database import SessionLocal, init_db
-from models import User, Feedback
-from sentiment import analyze_sentiment
-from ai_agent import get_agent_recommendation
-
-# Mock functions for urgency analysis as urgency.py is not provided.
-# In a real application, these would contain more sophisticated logic.
-def analyze_urgency(text: str) -> dict:
-    """Mock urgency analysis based on keywords."""
-    text_lower = text.lower()
-    if any(keyword in text_lower for keyword in ["urgent", "asap", "immediate", "cannot work", "broken"]):
-        return {"label": "High", "prob": 0.9}
-    if any(keyword in text_lower for keyword in ["slow", "issue", "problem", "confusing"]):
-        return {"label": "Medium", "prob": 0.6}
-    return {"label": "Low", "prob": 0.2}
-
-def apply_domain_rules(text: str, sentiment: dict, urgency: dict, domain: str) -> tuple:
-    """Mock domain rule application."""
-    # This could be expanded with domain-specific logic
-    if urgency["label"] == "High" and sentiment["label"] == "Negative":
-        return "Escalate", "Immediate Review Required"
-    return "No Action", "Standard Review"
+from models import User, Feedback, UploadJob
+from sentiment import analyze_sentiment_batch, initialize_model, FORK_UNSAFE_BACKENDS, MODEL_NAME as SENTIMENT_MODEL_NAME
+from score_cache import cached_scores
+from clustering import text_hash, top_clusters
+from urgency import match_keywords, urgency_from_matches, priority_from_matches
+from ai_agent import get_agent_recommendation, get_agent_recommendations_bulk, get_feedback_themes, MOCK_AI_RESPONSE
+import llm_cache
+import instrumentation
+from instrumentation import timed
+from dashboard import build_metrics, recent_feedback_texts
+from rollup import backfill_if_empty
+from digest import get_digest
+from listing import fetch_page, export_stream, DEFAULT_PAGE_SIZE
+from jobs import init_job_queue, start_workers, submit_job, job_status
+
+def score_feedback_chunk(texts: list, domain: str, user_id) -> tuple:
+    """
+    Scores a chunk of feedback texts and builds the Feedback row mappings to insert.
+
+    Each mapping carries its text_hash and, when the text went through the
+    model in this call, the pooled embedding under "_embedding" for ingestion
+    to cluster (it is not a column).
+
+    Returns:
+        (mappings, number of texts whose sentiment came from the dedup cache)
+    """
+    embeddings = {}
+    def score_unique(unique_texts):
+        results = analyze_sentiment_batch(unique_texts, batch_size=config.SENTIMENT_BATCH_SIZE, with_embeddings=True)
+        # Keep vectors out of the dedup cache; they are stored once per text in text_embeddings
+        for text, result in zip(unique_texts, results):
+            if "embedding" in result:
+                embeddings[text_hash(text)] = result.pop("embedding")
+        return results
+    sentiments, cache_hits = cached_scores(
+        f"sentiment:{SENTIMENT_MODEL_NAME}:{config.SENTIMENT_BACKEND}", texts, score_unique,
+    )
+    # One keyword scan per text; urgency and domain escalation both come from its match set.
+    # Not cached: a regex pass is far cheaper than a score cache lookup and write.
+    with timed("rules"):
+        rule_matches = [match_keywords(text) for text in texts]
+    feedback_rows = []
+    for text, sentiment, matches in zip(texts, sentiments, rule_matches):
+        urgency = urgency_from_matches(matches)
+        urgency, priority_action = priority_from_matches(matches, sentiment, urgency, domain)
+        row_hash = text_hash(text)
+        feedback_rows.append(dict(
+            user_text=text, sentiment_label=sentiment["label"],
+            sentiment_prob=sentiment["prob"], urgency_label=urgency["label"],
+            urgency_prob=urgency["prob"], priority_action=priority_action,
+            domain=domain, user_id=user_id, text_hash=row_hash,
+            _embedding=embeddings.get(row_hash)
+        ))
+    return feedback_rows, cache_hits
 
 app = Flask(__name__, template_folder="templates")
 CORS(app)
 init_db()
+_db = SessionLocal()
+try: backfill_if_empty(_db)
+finally: _db.close()
+init_job_queue(score_feedback_chunk)
+if not config.PRELOAD_APP:
+    start_workers()
+elif not config.INFERENCE_SERVER_URL and config.SENTIMENT_BACKEND not in FORK_UNSAFE_BACKENDS:
+    # With an inference server the workers score remotely; the in-process
+    # fallback loads the model lazily, so the master doesn't hold a copy.
+    initialize_model()
 
-def get_feedback_themes(all_feedback_texts: list) -> list:
-    """Extract common themes from feedback texts using the AI agent."""
-    from ai_agent import IS_CONFIGURED
-    if not IS_CONFIGURED or len(all_feedback_texts) < 5: # Require a minimum amount of data
-        return ["App Performance", "Login Issues", "UI Feedback", "Feature Request"]
-    try:
-        model = get_agent_recommendation.__globals__['genai'].GenerativeModel('gemini-1.0-pro')
-        # Use a sample of feedback to avoid overly large prompts
-        feedback_block = "\n".join(f"- {text}" for text in all_feedback_texts[:50])
-        prompt = f"""Analyze the following customer feedback. Identify the 3-5 most common themes. Return ONLY a valid JSON array of strings. Example: ["Login Problems", "UI Suggestions", "Payment Failures"]. Feedback:\n{feedback_block}\n\nJSON Response:"""
-        response = model.generate_content(prompt)
-        # Clean the response to ensure it is valid JSON
-        cleaned_response = re.sub(r'```json\n?|```', '', response.text.strip())
-        themes = json.loads(cleaned_response)
-        return themes if isinstance(themes, list) else ["AI Error: Invalid Format"]
-    except Exception as e:
-        print(f"GEMINI THEME EXTRACTION ERROR: {e}")
-        return ["App Performance", "Login Issues", "UI Feedback"]
+# --- Request timing and opt-in profiling (see instrumentation.py) ---
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    if config.PROFILE_REQUESTS:
+        g.profiler = instrumentation.start_profile()
+
+@app.teardown_request
+def record_request(exc):
+    if "request_started" in g:
+        instrumentation.observe("http_request_seconds", time.perf_counter() - g.request_started,
+                                endpoint=request.endpoint or "unmatched")
+    if g.get("profiler") is not None:
+        try: instrumentation.stop_profile(g.pop("profiler"), request.method, request.path)
+        except Exception as e: print(f"Request Profile Error: {e}")
 
 # --- HTML Serving Routes ---
 @app.route("/")
@@ -126,32 +164,32 @@ def upload_csv():
     domain = request.form.get("domain", "general")
     db: Session = SessionLocal()
     try:
-        stream = io.StringIO(file.stream.read().decode("UTF-8"))
-        csv_reader = csv.DictReader(stream)
-        feedback_entries = []
-        for row in csv_reader:
-            text = row.get('feedback') or row.get('text') or row.get('Feedback') or row.get('Text')
-            if text and text.strip():
-                sentiment = analyze_sentiment(text)
-                urgency = analyze_urgency(text)
-                _, priority_action = apply_domain_rules(text, sentiment, urgency, domain)
-                feedback_entries.append(Feedback(
-                    user_text=text, sentiment_label=sentiment["label"],
-                    sentiment_prob=sentiment["prob"], urgency_label=urgency["label"],
-                    urgency_prob=urgency["prob"], priority_action=priority_action,
-                    domain=domain, user_id=user_id
-                ))
-        
-        if feedback_entries:
-            db.add_all(feedback_entries); db.commit()
-        return jsonify({"success": True, "processed": len(feedback_entries)}), 200
-    except UnicodeDecodeError:
-        return jsonify({"success": False, "error": "Encoding error. Please save your CSV file as UTF-8."}), 400
+        file_path = os.path.join(config.UPLOAD_DIR, f"{uuid.uuid4().hex}.csv")
+        file.save(file_path)
+        job = UploadJob(user_id=user_id, domain=domain, filename=file.filename, file_path=file_path)
+        db.add(job); db.commit(); db.refresh(job)
+        submit_job(job.id)
+        return jsonify({"success": True, "job_id": job.id}), 202
     except Exception as e:
         db.rollback(); print(f"CSV Upload Error: {e}")
         return jsonify({"success": False, "error": "Failed to process CSV file."}), 500
     finally: db.close()
 
+@app.route("/api/upload_jobs/<int:job_id>", methods=["GET"])
+def get_upload_job(job_id):
+    user_id = request.args.get('userId')
+    if not user_id: return jsonify({"success": False, "error": "User ID is required."}), 401
+
+    db: Session = SessionLocal()
+    try:
+        job = db.query(UploadJob).filter(UploadJob.id == job_id, UploadJob.user_id == user_id).first()
+        if not job: return jsonify({"success": False, "error": "Upload job not found"}), 404
+        return jsonify({"success": True, "job": job_status(job)})
+    except Exception as e:
+        print(f"Upload Job Status Error: {e}")
+        return jsonify({"success": False, "error": "Failed to fetch upload status."}), 500
+    finally: db.close()
+
 @app.route("/api/metrics", methods=["GET"])
 def get_metrics():
     user_id = request.args.get('userId')
@@ -159,62 +197,165 @@ def get_metrics():
 
     db: Session = SessionLocal()
     try:
-        all_feedback = db.query(Feedback).filter(Feedback.user_id == user_id).order_by(Feedback.timestamp.desc()).all()
-        total = len(all_feedback)
-        if total == 0:
-            return jsonify({"success": True, "summary": {"total": 0}, "charts": {}, "critical_feedback": [], "themes": []})
-
-        positive_count = sum(1 for f in all_feedback if f.sentiment_label == "Positive")
-        negative_count = sum(1 for f in all_feedback if f.sentiment_label == "Negative")
-        high_urgency_count = sum(1 for f in all_feedback if f.urgency_label == "High")
-        score_sum = sum(f.sentiment_prob if f.sentiment_label == 'Positive' else -f.sentiment_prob if f.sentiment_label == 'Negative' else 0 for f in all_feedback)
-        
-        critical_feedback = [
-            {"id": f.id, "text": f.user_text, "timestamp": f.timestamp.strftime('%Y-%m-%d %H:%M'), 
-             "priority": round(((1 - f.sentiment_prob) + f.urgency_prob) / 2 * 10)} 
-            for f in all_feedback if f.sentiment_label == "Negative" and f.urgency_label == "High"
-        ][:10]
-        
-        today = datetime.utcnow().date()
-        feedback_counts_by_date = Counter(f.timestamp.date() for f in all_feedback)
-        trend_data = [{"date": (today - timedelta(days=i)).strftime('%m-%d'), "count": feedback_counts_by_date.get(today - timedelta(days=i), 0)} for i in range(29, -1, -1)]
-
-        metrics = {
-            "success": True,
-            "summary": {
-                "total": total,
-                "high_urgency": (high_urgency_count / total * 100),
-                "positive": (positive_count / total * 100),
-                "negative": (negative_count / total * 100),
-                "avg_score": score_sum / total if total > 0 else 0
-            },
-            "charts": {
-                "sentiment": {"Positive": positive_count, "Neutral": total - positive_count - negative_count, "Negative": negative_count},
-                "urgency": {"High": high_urgency_count, "Medium": sum(1 for f in all_feedback if f.urgency_label == "Medium"), "Low": sum(1 for f in all_feedback if f.urgency_label == "Low")},
-                "trend": trend_data
-            },
-            "critical_feedback": critical_feedback,
-            "themes": get_feedback_themes([f.user_text for f in all_feedback])
-        }
+        metrics = build_metrics(db, user_id)
+        if metrics is None:
+            return jsonify({"success": True, "summary": {"total": 0}, "charts": {}, "critical_feedback": [], "themes": [], "clusters": []})
+        metrics["clusters"] = top_clusters(db, user_id)
+        # Themes come from the local clusters; only data not yet clustered (see clustering.py) falls back to the LLM
+        metrics["themes"] = [c["text"] for c in metrics["clusters"]] or get_feedback_themes(user_id, recent_feedback_texts(db, user_id))
         return jsonify(metrics)
     except Exception as e:
         print(f"Metrics Error: {e}")
         return jsonify({"success": False, "error": "An error occurred while fetching metrics."}), 500
     finally: db.close()
 
+@app.route("/api/digest", methods=["GET"])
+def get_weekly_digest():
+    """The precomputed weekly digest (see digest.py); ?week= takes any date in the week, default the latest."""
+    user_id = request.args.get('userId')
+    if not user_id: return jsonify({"success": False, "error": "User ID is required."}), 401
+    try:
+        week = datetime.strptime(request.args['week'], '%Y-%m-%d').date() if request.args.get('week') else None
+    except ValueError:
+        return jsonify({"success": False, "error": "week must be a YYYY-MM-DD date."}), 400
+
+    db: Session = SessionLocal()
+    try:
+        digest = get_digest(db, user_id, week)
+        if digest is None: return jsonify({"success": False, "error": "No digest available for this week."}), 404
+        return jsonify({"success": True, "digest": digest})
+    except Exception as e:
+        print(f"Weekly Digest Error: {e}")
+        return jsonify({"success": False, "error": "Failed to fetch the weekly digest."}), 500
+    finally: db.close()
+
+@app.route("/api/feedback", methods=["GET"])
+def list_feedback():
+    """Keyset-paginated feedback, newest first. Pass next_cursor back as ?cursor= for the next page."""
+    user_id = request.args.get('userId')
+    if not user_id: return jsonify({"success": False, "error": "User ID is required."}), 401
+
+    db: Session = SessionLocal()
+    try:
+        limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+        page = fetch_page(db, user_id, request.args, limit=limit, cursor=request.args.get("cursor"))
+        return jsonify({"success": True, **page})
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        print(f"Feedback Listing Error: {e}")
+        return jsonify({"success": False, "error": "Failed to fetch feedback."}), 500
+    finally: db.close()
+
+@app.route("/api/feedback/export", methods=["GET"])
+def export_feedback():
+    user_id = request.args.get('userId')
+    if not user_id: return jsonify({"success": False, "error": "User ID is required."}), 401
+    fmt = request.args.get("format", "csv")
+    if fmt not in ("csv", "ndjson"): return jsonify({"success": False, "error": "format must be csv or ndjson"}), 400
+
+    try:
+        chunks = export_stream(SessionLocal, user_id, request.args, fmt)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(stream_with_context(chunks), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=feedback.{fmt}"})
+
 @app.route("/api/agent_insight/<int:feedback_id>", methods=["GET"])
 def get_insight(feedback_id):
     db: Session = SessionLocal()
     try:
         feedback = db.query(Feedback).filter(Feedback.id == feedback_id).first()
         if not feedback: return jsonify({"success": False, "error": "Feedback not found"}), 404
+        if feedback.agent_insight:
+            return jsonify({"success": True, "insight": feedback.agent_insight})
         recommendation = get_agent_recommendation(feedback.user_text)
+        if recommendation != MOCK_AI_RESPONSE:
+            feedback.agent_insight = recommendation; feedback.agent_insight_at = datetime.utcnow()
+            db.commit()
         return jsonify({"success": True, "insight": recommendation})
     except Exception as e:
-        print(f"Agent Insight Error: {e}")
+        db.rollback(); print(f"Agent Insight Error: {e}")
         return jsonify({"success": False, "error": "Failed to get AI insight."}), 500
     finally: db.close()
 
+@app.route("/api/agent_insights/bulk", methods=["POST"])
+def get_insights_bulk():
+    """
+    Generates and stores insights for many feedback items at once.
+    Body: {"userId": ..., "feedbackIds": [...]} (at most LLM_BULK_MAX_ITEMS) or
+    {"userId": ..., "critical": true}, which takes the newest LLM_BULK_MAX_ITEMS
+    critical items and sets "truncated" when there are more.
+    Work that doesn't fit in LLM_BULK_BUDGET_SECONDS comes back under "missing";
+    repeat the request to continue, since stored insights are not regenerated.
+    """
+    data = request.json or {}
+    user_id = data.get("userId")
+    if not user_id: return jsonify({"success": False, "error": "User ID is required."}), 401
+    feedback_ids = data.get("feedbackIds")
+    if not feedback_ids and not data.get("critical"):
+        return jsonify({"success": False, "error": "Provide feedbackIds or set critical to true."}), 400
+    if feedback_ids and len(feedback_ids) > config.LLM_BULK_MAX_ITEMS:
+        return jsonify({"success": False, "error": f"At most {config.LLM_BULK_MAX_ITEMS} feedbackIds per request."}), 400
+
+    db: Session = SessionLocal()
+    try:
+        query = db.query(Feedback).filter(Feedback.user_id == user_id)
+        if feedback_ids:
+            query = query.filter(Feedback.id.in_([int(i) for i in feedback_ids]))
+        else:
+            query = query.filter(Feedback.sentiment_label == "Negative", Feedback.urgency_label == "High")
+        # One extra row tells the caller that the critical list was cut
+        feedback_rows = query.order_by(Feedback.timestamp.desc()).limit(config.LLM_BULK_MAX_ITEMS + 1).all()
+        truncated = len(feedback_rows) > config.LLM_BULK_MAX_ITEMS
+        feedback_rows = feedback_rows[:config.LLM_BULK_MAX_ITEMS]
+
+        insights = {f.id: f.agent_insight for f in feedback_rows if f.agent_insight}
+        pending = [(f.id, f.user_text) for f in feedback_rows if not f.agent_insight]
+        generated, stats = get_agent_recommendations_bulk(pending)
+        stored_at = datetime.utcnow()
+        for f in feedback_rows:
+            recommendation = generated.get(f.id)
+            if recommendation and recommendation != MOCK_AI_RESPONSE:
+                f.agent_insight = recommendation; f.agent_insight_at = stored_at
+        db.commit()
+        insights.update(generated)
+        return jsonify({
+            "success": True,
+            "insights": {str(feedback_id): text for feedback_id, text in insights.items()},
+            "already_stored": len(feedback_rows) - len(pending),
+            "generated": len(generated),
+            "missing": [feedback_id for feedback_id, _ in pending if feedback_id not in generated],
+            "truncated": truncated,
+            "not_found": sorted({int(i) for i in feedback_ids} - {f.id for f in feedback_rows}) if feedback_ids else [],
+            "llm_calls": stats["llm_calls"],
+            "failed_calls": stats["failed_calls"],
+            "deferred_calls": stats["deferred_calls"],
+            "wall_seconds": stats["wall_seconds"],
+            "estimated_per_item_seconds": stats["estimated_per_item_seconds"],
+            "estimated_seconds_saved": round(max(0.0, stats["estimated_per_item_seconds"] - stats["wall_seconds"]), 3),
+        })
+    except ValueError:
+        return jsonify({"success": False, "error": "feedbackIds must be integers."}), 400
+    except Exception as e:
+        db.rollback(); print(f"Bulk Agent Insight Error: {e}")
+        return jsonify({"success": False, "error": "Failed to get AI insights."}), 500
+    finally: db.close()
+
+@app.route("/api/llm_cache/stats", methods=["GET"])
+def get_llm_cache_stats():
+    try:
+        return jsonify({"success": True, "cache": llm_cache.stats()})
+    except Exception as e:
+        print(f"LLM Cache Stats Error: {e}")
+        return jsonify({"success": False, "error": "Failed to read cache statistics."}), 500
+
+@app.route("/prometheus/metrics", methods=["GET"])
+def get_prometheus_metrics():
+    """Stage timings, counters and LLM latency of this process in the Prometheus text format."""
+    return Response(instrumentation.render(), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(debug=True, host="0.0.0.0", port=5000)
 
@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import bindparam, delete, update
+
+import config
+from models import Feedback, IssueCluster, TextEmbedding
+from score_cache import normalize
+from sentiment import analyze_sentiment_batch
+
+# --- Issue clustering ---
+# Each distinct normalized text is embedded once with the sentiment model's
+# own encoder (mean-pooled last hidden state, produced by the same forward
+# pass that scores it) and stored as an L2-normalized float16 blob in
+# text_embeddings. Rows are grouped per user with online mini-batch k-means:
+# every ingested chunk moves the nearest centroid towards its members with a
+# per-cluster learning rate of 1/size, and opens a new cluster while the user
+# has fewer than CLUSTER_MAX_PER_USER and nothing is similar enough. The
+# dashboard reads cluster sizes and representative texts straight from
+# issue_clusters, so no network call is involved.
+#
+# Mean-pooled RoBERTa states are strongly anisotropic: they share a large
+# common component, so even unrelated texts have a raw cosine similarity near
+# 1 and a fixed threshold would put everything in one cluster. Similarities
+# are therefore taken after subtracting a baseline, the mean embedding of a
+# sample of stored texts. Vectors and centroids are stored uncentred, so the
+# baseline can be re-estimated without rewriting them.
+
+REPRESENTATIVE_MAX_CHARS = 120
+BASELINE_SAMPLE = 2048
+_baseline = None
+
+def _numpy():
+    import numpy as np
+    return np
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(normalize(text).encode("utf-8")).hexdigest()
+
+def _unit(vector):
+    np = _numpy()
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def _unit_rows(matrix):
+    np = _numpy()
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1)
+
+def embedding_baseline(db):
+    """
+    Mean of up to BASELINE_SAMPLE stored embeddings, or None if there are none.
+    The sample is taken in text_hash order, which is effectively random and the
+    same in every process; the result is cached once the sample is full.
+    """
+    global _baseline
+    if _baseline is not None:
+        return _baseline
+    np = _numpy()
+    rows = db.query(TextEmbedding.vector).order_by(TextEmbedding.text_hash).limit(BASELINE_SAMPLE).all()
+    if not rows:
+        return None
+    mean = np.mean([np.frombuffer(blob, dtype=np.float16).astype(np.float32) for (blob,) in rows], axis=0)
+    if len(rows) == BASELINE_SAMPLE:
+        _baseline = mean
+    return mean
+
+def _insert_ignore_statement(db):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    return dialect_insert(TextEmbedding).on_conflict_do_nothing(index_elements=["text_hash"])
+
+def store_embeddings(db, vectors: dict):
+    """Saves {text_hash: vector} as float16 blobs, leaving existing hashes alone. Does not commit."""
+    np = _numpy()
+    if vectors:
+        db.execute(_insert_ignore_statement(db), [
+            {"text_hash": h, "vector": _unit(v).astype(np.float16).tobytes()} for h, v in vectors.items()
+        ])
+
+def load_embeddings(db, hashes: list) -> dict:
+    np = _numpy()
+    rows = db.query(TextEmbedding.text_hash, TextEmbedding.vector).filter(TextEmbedding.text_hash.in_(hashes)).all() if hashes else []
+    return {h: np.frombuffer(blob, dtype=np.float16).astype(np.float32) for h, blob in rows}
+
+def embed_texts(texts: list) -> list:
+    """Returns one unit vector per text, or None where the model couldn't produce one."""
+    results = analyze_sentiment_batch(texts, batch_size=config.SENTIMENT_BATCH_SIZE, with_embeddings=True)
+    return [_unit(r["embedding"]) if "embedding" in r else None for r in results]
+
+def _resolve_embeddings(db, texts_by_hash: dict, vectors: dict) -> dict:
+    """
+    Collects a unit vector for every hash: from `vectors` (fresh out of scoring),
+    then text_embeddings, then a forward pass for whatever is still missing
+    (e.g. texts whose sentiment came from the dedup cache). New ones are stored.
+    """
+    fresh = {h: _unit(v) for h, v in vectors.items() if h in texts_by_hash}
+    known = load_embeddings(db, [h for h in texts_by_hash if h not in fresh])
+    missing = [h for h in texts_by_hash if h not in fresh and h not in known]
+    if missing:
+        for h, vector in zip(missing, embed_texts([texts_by_hash[h] for h in missing])):
+            if vector is not None:
+                fresh[h] = vector
+    store_embeddings(db, fresh)
+    return {**known, **fresh}
+
+def assign_clusters(db, user_id, rows: list, vectors: dict = None) -> dict:
+    """
+    Assigns a chunk of a user's feedback to clusters and updates the centroids.
+
+    Does not commit; call it inside the transaction that inserts the rows.
+
+    Args:
+        db: An open Session.
+        user_id: Owner of the rows and clusters.
+        rows: (text_hash, text) pairs; repeated hashes weigh their cluster accordingly.
+        vectors: Optional {text_hash: embedding} already computed while scoring.
+
+    Returns:
+        {text_hash: cluster id}. Hashes that could not be embedded are left out.
+    """
+    np = _numpy()
+    counts = Counter(h for h, _ in rows)
+    texts_by_hash = {}
+    for h, text in rows:
+        texts_by_hash.setdefault(h, text)
+    embeddings = _resolve_embeddings(db, texts_by_hash, vectors or {})
+
+    # Row lock on PostgreSQL so concurrent uploads of one user don't lose centroid updates
+    clusters = db.query(IssueCluster).filter(IssueCluster.user_id == user_id).order_by(IssueCluster.id).with_for_update().all()
+    dims = len(next(iter(embeddings.values()))) if embeddings else 0
+    centroids = np.stack([np.frombuffer(c.centroid, dtype=np.float32) for c in clusters]) if clusters else np.empty((0, dims), dtype=np.float32)
+    # Includes this chunk's vectors, which _resolve_embeddings has just stored
+    baseline = embedding_baseline(db) if embeddings else None
+    if baseline is None:
+        baseline = np.zeros(dims, dtype=np.float32)
+    centred = _unit_rows(centroids - baseline)
+    now = datetime.utcnow()
+    assignments = {}
+    for h, count in counts.items():
+        x = embeddings.get(h)
+        if x is None:
+            continue
+        x_centred = _unit(x - baseline)
+        similarities = centred @ x_centred
+        best = int(similarities.argmax()) if clusters else -1
+        if best < 0 or (similarities[best] < config.CLUSTER_SIMILARITY_THRESHOLD and len(clusters) < config.CLUSTER_MAX_PER_USER):
+            cluster = IssueCluster(user_id=user_id, centroid=x.tobytes(), size=0,
+                                   representative_text=texts_by_hash[h][:REPRESENTATIVE_MAX_CHARS],
+                                   representative_similarity=1.0)
+            db.add(cluster)
+            db.flush()  # need the id for the feedback rows
+            clusters.append(cluster)
+            centroids = np.vstack([centroids, x[None, :]])
+            centred = np.vstack([centred, x_centred[None, :]])
+            best = len(clusters) - 1
+        cluster = clusters[best]
+        cluster.size += count
+        centroids[best] = _unit(centroids[best] + count * (x - centroids[best]) / cluster.size)
+        centred[best] = _unit(centroids[best] - baseline)
+        similarity = float(centred[best] @ x_centred)
+        if similarity >= (cluster.representative_similarity or -1.0):
+            cluster.representative_text = texts_by_hash[h][:REPRESENTATIVE_MAX_CHARS]
+            cluster.representative_similarity = similarity
+        cluster.updated_at = now
+        assignments[h] = cluster.id
+    for cluster, centroid in zip(clusters, centroids):
+        cluster.centroid = centroid.astype(np.float32).tobytes()
+    return assignments
+
+def top_clusters(db, user_id, limit: int = None) -> list:
+    """Returns the user's largest clusters as [{'id', 'size', 'text'}]."""
+    rows = db.query(IssueCluster.id, IssueCluster.size, IssueCluster.representative_text).filter(
+        IssueCluster.user_id == user_id, IssueCluster.size > 0,
+    ).order_by(IssueCluster.size.desc(), IssueCluster.id).limit(limit or config.CLUSTER_DASHBOARD_LIMIT).all()
+    return [{"id": cluster_id, "size": size, "text": text} for cluster_id, size, text in rows]
+
+def cluster_backlog(db, user_id=None, chunk_size: int = 256, reset: bool = False) -> int:
+    """
+    Clusters feedback rows that have no cluster yet (rows ingested before
+    clustering existed), one chunk per commit. With `reset`, drops the
+    user's clusters first and re-clusters everything.
+
+    Returns:
+        The number of rows assigned.
+    """
+    if reset:
+        reset_filter = [Feedback.user_id == user_id] if user_id is not None else []
+        db.execute(update(Feedback).where(*reset_filter).values(cluster_id=None))
+        db.execute(delete(IssueCluster).where(*([IssueCluster.user_id == user_id] if user_id is not None else [])))
+        db.commit()
+    query = db.query(Feedback.user_id).filter(Feedback.cluster_id.is_(None), Feedback.user_id.isnot(None))
+    user_ids = [user_id] if user_id is not None else [u for (u,) in query.distinct().all()]
+    stmt = update(Feedback.__table__).where(Feedback.__table__.c.id == bindparam("row_id")).values(
+        text_hash=bindparam("row_hash"), cluster_id=bindparam("row_cluster"))
+    assigned = 0
+    for uid in user_ids:
+        last_id = 0
+        while True:
+            chunk = db.query(Feedback.id, Feedback.user_text).filter(
+                Feedback.user_id == uid, Feedback.cluster_id.is_(None), Feedback.id > last_id,
+            ).order_by(Feedback.id).limit(chunk_size).all()
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+            hashed = [(row.id, text_hash(row.user_text), row.user_text) for row in chunk]
+            clusters = assign_clusters(db, uid, [(h, text) for _, h, text in hashed])
+            db.execute(stmt, [{"row_id": row_id, "row_hash": h, "row_cluster": clusters.get(h)} for row_id, h, _ in hashed])
+            db.commit()
+            assigned += sum(1 for _, h, _ in hashed if h in clusters)
+    return assigned
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+    parser = argparse.ArgumentParser(description="Cluster feedback rows that have no issue cluster yet.")
+    parser.add_argument("--user-id", type=int, help="Only this user (default: all users)")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--reset", action="store_true", help="Drop existing clusters and re-cluster everything")
+    args = parser.parse_args()
+    init_db()
+    db = SessionLocal()
+    try:
+        count = cluster_backlog(db, args.user_id, args.chunk_size, args.reset)
+        print(f"Clustered {count} feedback rows.")
+    finally: db.close()
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+from models import Feedback, MetricsDaily
+from rollup import COUNTER_COLUMNS
+
+# --- Dashboard aggregates ---
+# Counts and the trend come from the metrics_daily rollup (O(days) rows); only
+# the critical list and the theme sample touch the feedback table, through
+# LIMIT queries served by its composite indexes.
+
+TREND_DAYS = 30
+CRITICAL_LIMIT = 10
+THEME_SAMPLE_SIZE = 50
+
+def summary_counts(db, user_id) -> dict:
+    """Returns total, per-label counts and the signed sentiment score sum from the rollup."""
+    row = db.query(
+        *(func.sum(getattr(MetricsDaily, name)).label(name) for name in COUNTER_COLUMNS)
+    ).filter(MetricsDaily.user_id == user_id).one()
+    return {key: (value or 0) for key, value in row._mapping.items()}
+
+def daily_counts(db, user_id, days: int = TREND_DAYS) -> list:
+    """Returns [{'date': 'MM-DD', 'count': n}] for the last `days` days, oldest first."""
+    today = datetime.utcnow().date()
+    first_day = today - timedelta(days=days - 1)
+    rows = db.query(MetricsDaily.day, func.sum(MetricsDaily.total)).filter(
+        MetricsDaily.user_id == user_id, MetricsDaily.day >= first_day,
+    ).group_by(MetricsDaily.day).all()
+    counts = dict(rows)
+    return [{"date": (today - timedelta(days=i)).strftime('%m-%d'),
+             "count": counts.get(today - timedelta(days=i), 0)} for i in range(days - 1, -1, -1)]
+
+def summarize(counts: dict) -> dict:
+    """Turns rollup counters into the summary percentages and average score (all 0 with no feedback)."""
+    total = counts["total"] or 0
+    share = lambda n: (n / total * 100) if total else 0.0
+    return {
+        "total": total,
+        "high_urgency": share(counts["high"]),
+        "positive": share(counts["positive"]),
+        "negative": share(counts["negative"]),
+        "avg_score": counts["score_sum"] / total if total else 0.0
+    }
+
+def priority_score(sentiment_prob: float, urgency_prob: float) -> int:
+    return round(((1 - sentiment_prob) + urgency_prob) / 2 * 10)
+
+def critical_feedback(db, user_id, limit: int = CRITICAL_LIMIT) -> list:
+    rows = db.query(Feedback).filter(
+        Feedback.user_id == user_id,
+        Feedback.sentiment_label == "Negative",
+        Feedback.urgency_label == "High",
+    ).order_by(Feedback.timestamp.desc()).limit(limit).all()
+    return [
+        {"id": f.id, "text": f.user_text, "timestamp": f.timestamp.strftime('%Y-%m-%d %H:%M'),
+         "priority": priority_score(f.sentiment_prob, f.urgency_prob)}
+        for f in rows
+    ]
+
+def recent_feedback_texts(db, user_id, limit: int = THEME_SAMPLE_SIZE) -> list:
+    # id breaks ties between rows of the same chunk so the sample (and its cache key) is stable
+    rows = db.query(Feedback.user_text).filter(Feedback.user_id == user_id).order_by(Feedback.timestamp.desc(), Feedback.id.desc()).limit(limit).all()
+    return [text for (text,) in rows]
+
+def build_metrics(db, user_id):
+    """
+    Builds the /api/metrics payload (without themes) for a user.
+
+    Returns:
+        The metrics dictionary, or None if the user has no feedback.
+    """
+    counts = summary_counts(db, user_id)
+    total = counts["total"]
+    if total == 0:
+        return None
+    positive, negative, high = counts["positive"], counts["negative"], counts["high"]
+    return {
+        "success": True,
+        "summary": summarize(counts),
+        "charts": {
+            "sentiment": {"Positive": positive, "Neutral": total - positive - negative, "Negative": negative},
+            "urgency": {"High": high, "Medium": counts["medium"], "Low": counts["low"]},
+            "trend": daily_counts(db, user_id)
+        },
+        "critical_feedback": critical_feedback(db, user_id),
+    }
@@ -1,13 +1,44 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from models import Base
 import config
 
+def make_engine(uri: str):
+    """
+    Creates an engine for `uri` with pooling suited to the backend.
+
+    SQLite connections are switched to WAL journaling, so readers no longer
+    block on a writer (and vice versa), with synchronous=NORMAL and a busy
+    timeout so competing writers wait instead of failing immediately with
+    "database is locked".
+    """
+    if not uri.startswith("sqlite"):
+        return create_engine(uri, pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW, pool_pre_ping=True)
+
+    if uri in ("sqlite://", "sqlite:///:memory:"):
+        # One shared connection, otherwise every checkout sees a new empty database
+        return create_engine(uri, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    sqlite_engine = create_engine(
+        uri,
+        connect_args={"check_same_thread": False, "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=config.DB_POOL_SIZE, max_overflow=config.DB_MAX_OVERFLOW,
+    )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _configure_sqlite(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+    return sqlite_engine
+
 # Create the engine using the database URI from the config file
-engine = create_engine(
-    config.DATABASE_URI, 
-    connect_args={"check_same_thread": False}
-)
+engine = make_engine(config.DATABASE_URI)
 
 # Create a sessionmaker
 SessionLocal = sessionmaker(
@@ -21,4 +52,59 @@ def init_db():
     Creates the database tables based on the models.
     This function is safe to run multiple times; it won't re-create existing tables.
     """
-    Base.metadata.create_all(bind=engine)
+    try:
+        Base.metadata.create_all(bind=engine)
+    except DBAPIError:
+        # Another worker created some of the tables at the same time; the retry skips those
+        Base.metadata.create_all(bind=engine)
+    upgrade_schema()
+
+def _apply_ddl(bind, statement, already_applied):
+    """
+    Runs one schema change in its own transaction. Without a preloaded
+    master every gunicorn worker upgrades the schema at import, so a change
+    that fails because another process applied it first is not an error.
+    """
+    try:
+        with bind.begin() as conn:
+            statement(conn)
+    except DBAPIError:
+        if not already_applied():
+            raise
+
+def upgrade_schema(bind=None):
+    """
+    Brings an existing database up to date with the models.
+
+    `create_all` never alters tables that already exist, so this adds any
+    model columns missing from them (new columns must be nullable) and
+    creates any missing indexes. Safe to run repeatedly, also from several
+    processes at once.
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    quote = bind.dialect.identifier_preparer.quote
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=bind.dialect)
+                _apply_ddl(
+                    bind,
+                    lambda conn: conn.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}")),
+                    lambda: column.name in {c["name"] for c in inspect(bind).get_columns(table.name)},
+                )
+        existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                _apply_ddl(
+                    bind,
+                    lambda conn: index.create(bind=conn),
+                    lambda: index.name in {i["name"] for i in inspect(bind).get_indexes(table.name)},
+                )
+
+if __name__ == "__main__":
+    init_db()
+    print(f"Database schema is up to date: {config.DATABASE_URI}")
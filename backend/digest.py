@@ -0,0 +1,192 @@
+import json
+import argparse
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func, case, select
+
+from models import Feedback, IssueCluster, MetricsDaily, WeeklyDigest
+from rollup import COUNTER_COLUMNS
+from dashboard import summarize, priority_score
+
+# --- Weekly digest ---
+# A batch job (run it weekly from cron or a platform scheduler, e.g.
+# `python digest.py` early on Monday) materializes one JSON snapshot per user
+# and week (Monday to Sunday, UTC) in weekly_digests, which /api/digest
+# returns with a primary-key lookup. Users are processed in batches: per
+# batch, one grouped query over the metrics_daily rollup gives this week's
+# and last week's counters, and one ROW_NUMBER() query each over the
+# feedback rows of the week gives the top critical items and the largest
+# issue clusters. Each batch is upserted and committed on its own, and
+# users that already have the week's digest are skipped, so an interrupted
+# run resumes where it stopped; --force regenerates them.
+
+CRITICAL_LIMIT = 5
+THEME_LIMIT = 5
+USER_BATCH_SIZE = 500
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+def last_complete_week(today: date = None) -> date:
+    return week_start(today or datetime.utcnow().date()) - timedelta(days=7)
+
+def _bounds(start: date) -> tuple:
+    return datetime.combine(start, time.min), datetime.combine(start + timedelta(days=7), time.min)
+
+def pending_users(db, start: date, force: bool = False, user_id=None) -> list:
+    """Users with feedback in the week or the one before, minus those already digested (unless `force`)."""
+    query = db.query(MetricsDaily.user_id).filter(
+        MetricsDaily.day >= start - timedelta(days=7), MetricsDaily.day < start + timedelta(days=7),
+    )
+    if user_id is not None:
+        query = query.filter(MetricsDaily.user_id == user_id)
+    if not force:
+        query = query.filter(MetricsDaily.user_id.not_in(
+            select(WeeklyDigest.user_id).where(WeeklyDigest.week_start == start)))
+    return [uid for (uid,) in query.distinct().order_by(MetricsDaily.user_id).all()]
+
+def _week_counts(db, user_ids: list, start: date) -> dict:
+    """{user_id: {'current': counters, 'previous': counters}} from the rollup."""
+    bucket = case((MetricsDaily.day >= start, "current"), else_="previous")
+    rows = db.query(
+        MetricsDaily.user_id, bucket.label("bucket"),
+        *(func.sum(getattr(MetricsDaily, name)).label(name) for name in COUNTER_COLUMNS)
+    ).filter(
+        MetricsDaily.user_id.in_(user_ids),
+        MetricsDaily.day >= start - timedelta(days=7), MetricsDaily.day < start + timedelta(days=7),
+    ).group_by(MetricsDaily.user_id, bucket).all()
+    counts = defaultdict(lambda: {"current": dict.fromkeys(COUNTER_COLUMNS, 0), "previous": dict.fromkeys(COUNTER_COLUMNS, 0)})
+    for row in rows:
+        counts[row.user_id][row.bucket] = {name: getattr(row, name) or 0 for name in COUNTER_COLUMNS}
+    return counts
+
+def _daily_totals(db, user_ids: list, start: date) -> dict:
+    rows = db.query(MetricsDaily.user_id, MetricsDaily.day, func.sum(MetricsDaily.total)).filter(
+        MetricsDaily.user_id.in_(user_ids), MetricsDaily.day >= start, MetricsDaily.day < start + timedelta(days=7),
+    ).group_by(MetricsDaily.user_id, MetricsDaily.day).all()
+    daily = defaultdict(dict)
+    for uid, day, total in rows:
+        daily[uid][day] = total
+    return daily
+
+def _critical_items(db, user_ids: list, start: date, limit: int) -> dict:
+    """Top Negative + High urgency rows of the week per user, highest priority first."""
+    week_from, week_to = _bounds(start)
+    rank = func.row_number().over(
+        partition_by=Feedback.user_id,
+        order_by=((Feedback.urgency_prob - Feedback.sentiment_prob).desc(), Feedback.timestamp.desc(), Feedback.id.desc()),
+    ).label("rank")
+    ranked = select(
+        Feedback.id, Feedback.user_id, Feedback.user_text, Feedback.timestamp,
+        Feedback.sentiment_prob, Feedback.urgency_prob, rank,
+    ).where(
+        Feedback.user_id.in_(user_ids), Feedback.sentiment_label == "Negative", Feedback.urgency_label == "High",
+        Feedback.timestamp >= week_from, Feedback.timestamp < week_to,
+    ).subquery()
+    items = defaultdict(list)
+    for row in db.execute(select(ranked).where(ranked.c.rank <= limit).order_by(ranked.c.user_id, ranked.c.rank)):
+        items[row.user_id].append({
+            "id": row.id, "text": row.user_text, "timestamp": row.timestamp.strftime('%Y-%m-%d %H:%M'),
+            "priority": priority_score(row.sentiment_prob, row.urgency_prob),
+        })
+    return items
+
+def _week_themes(db, user_ids: list, start: date, limit: int) -> dict:
+    """The issue clusters with the most rows this week per user, with their representative texts."""
+    week_from, week_to = _bounds(start)
+    counts = select(Feedback.user_id, Feedback.cluster_id, func.count(Feedback.id).label("rows")).where(
+        Feedback.user_id.in_(user_ids), Feedback.cluster_id.is_not(None),
+        Feedback.timestamp >= week_from, Feedback.timestamp < week_to,
+    ).group_by(Feedback.user_id, Feedback.cluster_id).subquery()
+    rank = func.row_number().over(
+        partition_by=counts.c.user_id, order_by=(counts.c.rows.desc(), counts.c.cluster_id),
+    ).label("rank")
+    ranked = select(counts, rank).subquery()
+    themes = defaultdict(list)
+    for row in db.execute(
+        select(ranked.c.user_id, ranked.c.cluster_id, ranked.c.rows, IssueCluster.representative_text)
+        .join(IssueCluster, IssueCluster.id == ranked.c.cluster_id)
+        .where(ranked.c.rank <= limit).order_by(ranked.c.user_id, ranked.c.rank)
+    ):
+        themes[row.user_id].append({"id": row.cluster_id, "size": row.rows, "text": row.representative_text})
+    return themes
+
+def build_payload(start: date, counts: dict, daily: dict, critical: list, themes: list) -> dict:
+    current, previous = summarize(counts["current"]), summarize(counts["previous"])
+    return {
+        "week_start": start.isoformat(),
+        "week_end": (start + timedelta(days=6)).isoformat(),
+        "summary": current,
+        "previous": previous,
+        "deltas": {key: current[key] - previous[key] for key in current},
+        "daily": [{"date": (start + timedelta(days=i)).isoformat(), "count": daily.get(start + timedelta(days=i), 0)}
+                  for i in range(7)],
+        "critical_feedback": critical,
+        "themes": themes,
+    }
+
+def _upsert_statement(db):
+    """Returns an INSERT that replaces the payload of an existing digest."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(WeeklyDigest)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "week_start"],
+        set_={"payload": stmt.excluded.payload, "generated_at": stmt.excluded.generated_at},
+    )
+
+def generate_digests(db, start: date, force: bool = False, user_id=None, batch_size: int = USER_BATCH_SIZE) -> int:
+    """
+    Builds and stores the digests of the week starting `start` (a Monday).
+
+    Commits once per batch of users, so a rerun after a crash only does the
+    users that are still missing.
+
+    Returns:
+        The number of digests written.
+    """
+    user_ids = pending_users(db, start, force, user_id)
+    generated_at = datetime.utcnow()
+    for offset in range(0, len(user_ids), batch_size):
+        batch = user_ids[offset:offset + batch_size]
+        counts = _week_counts(db, batch, start)
+        daily = _daily_totals(db, batch, start)
+        critical = _critical_items(db, batch, start, CRITICAL_LIMIT)
+        themes = _week_themes(db, batch, start, THEME_LIMIT)
+        db.execute(_upsert_statement(db), [
+            {"user_id": uid, "week_start": start, "generated_at": generated_at,
+             "payload": json.dumps(build_payload(start, counts[uid], daily[uid], critical[uid], themes[uid]))}
+            for uid in batch
+        ])
+        db.commit()
+    return len(user_ids)
+
+def get_digest(db, user_id, week: date = None):
+    """Returns the stored digest for the week containing `week` (default: the latest one), or None."""
+    query = db.query(WeeklyDigest.payload).filter(WeeklyDigest.user_id == user_id)
+    if week is not None:
+        query = query.filter(WeeklyDigest.week_start == week_start(week))
+    row = query.order_by(WeeklyDigest.week_start.desc()).first()
+    return json.loads(row.payload) if row else None
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Generate the weekly feedback digests.")
+    parser.add_argument("--week", type=date.fromisoformat, default=None,
+                        help="Any date in the week to digest (default: the last complete week).")
+    parser.add_argument("--user-id", type=int, default=None, help="Only this user.")
+    parser.add_argument("--force", action="store_true", help="Regenerate digests that already exist.")
+    parser.add_argument("--batch-size", type=int, default=USER_BATCH_SIZE)
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        start = week_start(args.week) if args.week else last_complete_week()
+        count = generate_digests(db, start, args.force, args.user_id, args.batch_size)
+        print(f"Generated {count} weekly digests for the week of {start.isoformat()}.")
+    finally: db.close()
@@ -0,0 +1,144 @@
+import json
+import queue
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+from instrumentation import render
+from sentiment import analyze_sentiment_batch_local, encode_embedding, initialize_model
+
+# --- Sentiment inference service ---
+# One process holds the model for all web workers. Requests from every
+# client are queued and gathered into micro-batches (up to max_batch texts,
+# waiting at most max_wait_ms for more to arrive), which run on a dedicated
+# thread pool. sentiment.analyze_sentiment_batch talks to it when
+# INFERENCE_SERVER_URL is set. Batches always keep the pooled embeddings
+# (they come out of the same forward pass); they are only serialized for
+# requests that ask for them. GET /metrics reports this process's stage
+# timings and batch sizes (see instrumentation.py).
+
+class MicroBatcher:
+    def __init__(self, max_batch: int, max_wait_ms: float, threads: int):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._requests = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(threads)
+        threading.Thread(target=self._collect_forever, name="micro-batcher", daemon=True).start()
+
+    def submit(self, texts: list) -> Future:
+        future = Future()
+        self._requests.put((texts, future))
+        return future
+
+    def _collect_forever(self):
+        while True:
+            # Don't start gathering the next batch until a thread can run it, so
+            # requests keep accumulating (and batches grow) while all threads are busy.
+            self._slots.acquire()
+            batch = [self._requests.get()]
+            size = len(batch[0][0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._executor.submit(self._run, batch)
+
+    def _run(self, batch: list):
+        try:
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            results = analyze_sentiment_batch_local(texts, batch_size=self.max_batch, with_embeddings=True)
+            offset = 0
+            for request_texts, future in batch:
+                future.set_result(results[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+def make_handler(batcher: MicroBatcher):
+    class InferenceHandler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                return self._send(200, {"success": True})
+            if self.path == "/metrics":
+                body = render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                return self.wfile.write(body)
+            self._send(404, {"success": False, "error": "Not found"})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                return self._send(404, {"success": False, "error": "Not found"})
+            try:
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                texts = data["texts"]
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise ValueError("texts must be a list of strings")
+                with_embeddings = bool(data.get("embeddings"))
+            except (ValueError, KeyError) as e:
+                return self._send(400, {"success": False, "error": f"Invalid request: {e}"})
+            try:
+                results = batcher.submit(texts).result() if texts else []
+                payload = []
+                for r in results:
+                    item = {"label": r["label"], "prob": r["prob"]}
+                    if r.get("fallback"):
+                        item["fallback"] = True
+                    elif with_embeddings:
+                        item["embedding"] = encode_embedding(r["embedding"])
+                    payload.append(item)
+                self._send(200, {"success": True, "results": payload})
+            except Exception as e:
+                logging.error(f"Inference error: {e}")
+                self._send(500, {"success": False, "error": "Inference failed."})
+
+        def log_message(self, format, *args):
+            pass
+
+    return InferenceHandler
+
+def serve(host: str, port: int, max_batch: int, max_wait_ms: float, threads: int):
+    initialize_model()
+    batcher = MicroBatcher(max_batch, max_wait_ms, threads)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher))
+    server.daemon_threads = True
+    print(f"Sentiment inference server on http://{host}:{port} "
+          f"(max_batch={max_batch}, max_wait_ms={max_wait_ms}, threads={threads})")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the shared sentiment inference server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-batch", type=int, default=config.INFERENCE_MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=config.INFERENCE_MAX_WAIT_MS)
+    parser.add_argument("--threads", type=int, default=config.INFERENCE_THREADS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(args.host, args.port, args.max_batch, args.max_wait_ms, args.threads)
@@ -0,0 +1,137 @@
+import csv
+import codecs
+import itertools
+import time
+from datetime import datetime
+
+from sqlalchemy import func, insert, update
+
+from models import Feedback, UploadJob
+from rollup import apply_feedback_rows
+from clustering import assign_clusters
+from llm_cache import invalidate_tag, themes_tag
+from instrumentation import inc, timed
+
+# --- Streaming ingestion pipeline ---
+# raw bytes -> incremental UTF-8 decode -> csv.DictReader -> fixed-size chunks
+# -> scoring -> cluster assignment -> executemany insert + rollup update. Only
+# one chunk of rows is held in memory at a time, so peak memory does not
+# depend on the size of the uploaded file.
+
+READ_BLOCK_SIZE = 64 * 1024
+
+def iter_decoded_lines(stream, block_size: int = READ_BLOCK_SIZE):
+    """
+    Decodes a binary stream as UTF-8 block by block and yields text lines.
+
+    Lines keep their trailing newline so csv can reassemble quoted fields
+    that span several lines. A leading byte order mark is dropped.
+
+    Raises:
+        UnicodeDecodeError: If the stream is not valid UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    while True:
+        block = stream.read(block_size)
+        pending += decoder.decode(block, final=not block)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+        if not block:
+            break
+    if pending:
+        yield pending
+
+def iter_csv_rows(stream):
+    return csv.DictReader(iter_decoded_lines(stream))
+
+def row_text(row: dict):
+    return row.get('feedback') or row.get('text') or row.get('Feedback') or row.get('Text')
+
+class JobLost(Exception):
+    """Another worker claimed the job; this one must stop without committing."""
+
+def _add(column, amount):
+    return func.coalesce(column, 0) + amount
+
+def chunked(iterable, size: int):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+def ingest_job(db, job, stream, score_chunk, chunk_size: int, claim_token: str = None):
+    """
+    Scores and inserts the rows of an upload, committing once per chunk.
+
+    Rows already consumed by an earlier run (job.rows_read) are skipped, and
+    each chunk's inserts are committed together with the job's counters and
+    the metrics rollup, so the job can be resumed from its last committed chunk.
+    With a claim_token, the counter update only applies while the job still
+    carries that token; otherwise the chunk is rolled back and JobLost raised,
+    so a worker whose job was re-claimed never inserts rows twice.
+
+    Args:
+        db: An open Session.
+        job: The UploadJob being processed.
+        stream: Binary file object positioned at the start of the CSV.
+        score_chunk: Callable (texts, domain, user_id) -> (Feedback mappings, cache hits).
+            Mappings carry text_hash and may carry an "_embedding" vector.
+        chunk_size: Number of CSV rows per chunk.
+        claim_token: The token written by the claim (see jobs._claim).
+    """
+    # Read once, so each chunk doesn't re-select the job expired by the last commit
+    job_id, domain, user_id = job.id, job.domain, job.user_id
+    rows = itertools.islice(iter_csv_rows(stream), job.rows_read, None)
+    chunks = chunked(rows, chunk_size)
+    while True:
+        with timed("csv_parse"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        started = time.perf_counter()
+        texts = [text for text in map(row_text, chunk) if text and text.strip()]
+        inserted = cache_hits = errors = 0
+        last_error = None
+        try:
+            with timed("score"):
+                mappings, cache_hits = score_chunk(texts, domain, user_id) if texts else ([], 0)
+            stamped_at = datetime.utcnow()
+            vectors = {}
+            for mapping in mappings:
+                mapping["timestamp"] = stamped_at
+                vector = mapping.pop("_embedding", None)
+                if vector is not None:
+                    vectors[mapping["text_hash"]] = vector
+            if mappings:
+                with timed("clustering"):
+                    clusters = assign_clusters(db, user_id, [(m["text_hash"], m["user_text"]) for m in mappings], vectors)
+                for mapping in mappings:
+                    mapping["cluster_id"] = clusters.get(mapping["text_hash"])
+                with timed("db_insert"):
+                    # Core executemany; no ORM objects or identity-map bookkeeping
+                    db.execute(insert(Feedback.__table__), mappings)
+                    apply_feedback_rows(db, mappings, stamped_at.date())
+                    invalidate_tag(db, themes_tag(user_id))
+            inserted = len(mappings)
+        except Exception as e:
+            db.rollback(); print(f"Upload Job {job_id} Chunk Error: {e}")
+            cache_hits = 0; errors = len(texts); last_error = str(e)
+        progress = dict(
+            rows_read=_add(UploadJob.rows_read, len(chunk)), rows_done=_add(UploadJob.rows_done, inserted),
+            errors=_add(UploadJob.errors, errors), cache_hits=_add(UploadJob.cache_hits, cache_hits),
+            processing_seconds=_add(UploadJob.processing_seconds, time.perf_counter() - started),
+            heartbeat_at=datetime.utcnow(),
+        )
+        if last_error is not None:
+            progress["last_error"] = last_error
+        fence = [UploadJob.id == job_id] + ([UploadJob.claim_token == claim_token] if claim_token else [])
+        with timed("db_commit"):
+            if db.execute(update(UploadJob).where(*fence).values(**progress)
+                          .execution_options(synchronize_session=False)).rowcount != 1:
+                db.rollback()
+                raise JobLost(f"Upload job {job_id} was claimed by another worker")
+            db.commit()
+        inc("ingest_rows_total", inserted, outcome="inserted")
+        inc("ingest_rows_total", errors, outcome="failed")
+        inc("ingest_rows_total", len(chunk) - len(texts), outcome="empty")
@@ -0,0 +1,141 @@
+import os
+import re
+import time
+import cProfile
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+
+import config
+
+# --- Instrumentation ---
+# In-process counters and histograms for the stages of scoring and ingestion
+# (CSV parsing, tokenization, model forward, rules, clustering, DB writes)
+# and for LLM calls, rendered in the Prometheus text exposition format by
+# the /prometheus/metrics route. Values live in each process: under gunicorn
+# every worker (and the inference server) reports its own, so scrape them
+# individually or read them as a per-worker sample.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+# name -> (type, help, buckets)
+METRICS = {
+    "stage_seconds": ("histogram", "Time spent per pipeline stage.", DEFAULT_BUCKETS),
+    "sentiment_batch_size": ("histogram", "Texts per sentiment model forward pass.", SIZE_BUCKETS),
+    "sentiment_texts_total": ("counter", "Texts run through the sentiment model.", None),
+    "score_cache_lookups_total": ("counter", "Dedup cache lookups while scoring, by cache and result.", None),
+    "ingest_rows_total": ("counter", "Uploaded feedback rows, by outcome.", None),
+    "llm_request_seconds": ("histogram", "LLM call latency, by outcome.", DEFAULT_BUCKETS),
+    "llm_errors_total": ("counter", "LLM calls that failed, by reason.", None),
+    "llm_cache_lookups_total": ("counter", "LLM response cache lookups, by result.", None),
+    "http_request_seconds": ("histogram", "Flask request latency, by endpoint.", DEFAULT_BUCKETS),
+}
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+_values = {}  # (name, sorted label items) -> float or Histogram
+_lock = threading.Lock()
+
+def _key(name: str, labels: dict) -> tuple:
+    if name not in METRICS:
+        raise KeyError(f"Unknown metric '{name}'")
+    return name, tuple(sorted(labels.items()))
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _values.get(key)
+        if histogram is None:
+            histogram = _values[key] = Histogram(METRICS[name][2])
+        histogram.observe(value)
+
+@contextmanager
+def timed(stage: str):
+    """Records the duration of the block in stage_seconds{stage=...}, also when it raises."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - started, stage=stage)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+def render() -> str:
+    """Returns every metric in the Prometheus text exposition format (version 0.0.4)."""
+    with _lock:
+        snapshot = {key: (value if not isinstance(value, Histogram) else
+                          (value.buckets, list(value.counts), value.sum)) for key, value in _values.items()}
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        series = sorted(((labels, value) for (metric, labels), value in snapshot.items() if metric == name), key=lambda item: item[0])
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            buckets, counts, total = value
+            cumulative = 0
+            for bound, count in zip(buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+def reset():
+    with _lock:
+        _values.clear()
+
+# --- Request profiling ---
+# With PROFILE_REQUESTS=1 every Flask request runs under cProfile and its
+# stats are written to PROFILE_DIR as <time>-<method>-<path>.prof (open them
+# with `python -m pstats` or snakeviz). cProfile profilers interfere with
+# each other, so one request is profiled at a time per process and requests
+# that overlap it are not profiled. Streamed responses are only profiled up
+# to the first byte.
+
+_profile_lock = threading.Lock()
+
+def start_profile():
+    """Returns an enabled profiler, or None if another request is being profiled."""
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def stop_profile(profiler, method: str, path: str) -> str:
+    try:
+        profiler.disable()
+    finally:
+        _profile_lock.release()
+    os.makedirs(config.PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    filename = os.path.join(config.PROFILE_DIR, f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{method}-{slug}.prof")
+    profiler.dump_stats(filename)
+    return filename
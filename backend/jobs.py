@@ -0,0 +1,166 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update, or_, and_
+
+import config
+from database import SessionLocal
+from models import UploadJob
+from ingest import JobLost, ingest_job
+
+# --- Background upload processing ---
+# Uploads are spooled to disk and handed to a small thread pool. Each chunk of
+# rows is committed together with the job's progress counters, so a job that
+# was interrupted (worker restart, crash) resumes from its last committed chunk.
+# A running job is kept fresh by a heartbeat thread; jobs whose heartbeat
+# goes stale are re-claimed with a new claim token, and the previous owner's
+# next chunk commit is rejected (see ingest.JobLost).
+
+_executor = None
+_executor_pid = None
+_score_chunk = None
+_start_lock = threading.Lock()
+
+def init_job_queue(score_chunk):
+    """
+    Registers the scoring function used by the workers.
+
+    Args:
+        score_chunk: Callable (texts, domain, user_id) -> (Feedback mappings, cache hits).
+    """
+    global _score_chunk
+    _score_chunk = score_chunk
+    os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+
+def start_workers():
+    """
+    Starts this process's thread pool and sweeper (which resumes unfinished
+    jobs) if not already running.
+
+    Threads do not survive fork(), so a gunicorn worker forked from a
+    preloaded master calls this again (see post_fork in gunicorn.conf.py).
+    """
+    global _executor, _executor_pid
+    with _start_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            return
+        _executor = ThreadPoolExecutor(max_workers=config.UPLOAD_WORKERS, thread_name_prefix="upload-job")
+        _executor_pid = os.getpid()
+    threading.Thread(target=_sweep_forever, name="upload-job-sweeper", daemon=True).start()
+
+def submit_job(job_id: int):
+    start_workers()
+    _executor.submit(_run_job, job_id)
+
+def resume_pending_jobs():
+    """Resubmits queued jobs and running jobs whose worker stopped sending heartbeats."""
+    db = SessionLocal()
+    try:
+        job_ids = [row.id for row in db.query(UploadJob.id).filter(_claimable()).all()]
+    finally:
+        db.close()
+    for job_id in job_ids:
+        submit_job(job_id)
+
+def job_status(job: UploadJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "filename": job.filename,
+        "rows_read": job.rows_read,
+        "rows_done": job.rows_done,
+        "errors": job.errors,
+        "last_error": job.last_error,
+        "rows_per_sec": round(job.rows_done / job.processing_seconds, 1) if job.processing_seconds else 0.0,
+        # Share of rows whose scores were reused from an identical (normalized) earlier text
+        "dedup_ratio": round((job.cache_hits or 0) / job.rows_done, 3) if job.rows_done else 0.0,
+    }
+
+def _sweep_forever():
+    while True:
+        try:
+            resume_pending_jobs()
+        except Exception as e:
+            print(f"Upload Job Sweep Error: {e}")
+        time.sleep(config.UPLOAD_JOB_STALE_SECONDS)
+
+def _claimable():
+    stale = datetime.utcnow() - timedelta(seconds=config.UPLOAD_JOB_STALE_SECONDS)
+    return or_(
+        UploadJob.status == "queued",
+        and_(UploadJob.status == "running", UploadJob.heartbeat_at < stale),
+    )
+
+def _claim(db, job_id: int):
+    """Atomically marks the job as running under a new claim token; returns the token, or None if not claimable."""
+    token = uuid.uuid4().hex
+    result = db.execute(
+        update(UploadJob)
+        .where(UploadJob.id == job_id, _claimable())
+        .values(status="running", heartbeat_at=datetime.utcnow(), claim_token=token)
+    )
+    db.commit()
+    return token if result.rowcount == 1 else None
+
+def _owned(job_id: int, token: str):
+    return and_(UploadJob.id == job_id, UploadJob.claim_token == token)
+
+def _heartbeat(job_id: int, token: str, stop: threading.Event):
+    """Refreshes heartbeat_at while a chunk is being scored, so slow chunks don't look stale."""
+    while not stop.wait(config.UPLOAD_JOB_STALE_SECONDS / 4):
+        db = SessionLocal()
+        try:
+            db.execute(update(UploadJob).where(_owned(job_id, token)).values(heartbeat_at=datetime.utcnow()))
+            db.commit()
+        except Exception as e:
+            db.rollback(); print(f"Upload Job {job_id} Heartbeat Error: {e}")
+        finally: db.close()
+
+def _run_job(job_id: int):
+    db = SessionLocal()
+    token = _claim(db, job_id)
+    if token is None:
+        db.close()
+        return
+    stop = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, token, stop), name=f"upload-job-{job_id}-heartbeat", daemon=True).start()
+    try:
+        job = db.get(UploadJob, job_id)
+        file_path = job.file_path
+        with open(file_path, 'rb') as f:
+            ingest_job(db, job, f, _score_chunk, config.UPLOAD_CHUNK_SIZE, claim_token=token)
+        finished = db.execute(
+            update(UploadJob).where(_owned(job_id, token)).values(status="done", finished_at=datetime.utcnow())
+        ).rowcount == 1
+        db.commit()
+        if finished:
+            os.remove(file_path)
+    except JobLost as e:
+        db.rollback(); print(f"Upload Job {job_id} Error: {e}")
+    except UnicodeDecodeError:
+        db.rollback()
+        _fail(db, job_id, token, "Encoding error. Please save your CSV file as UTF-8.")
+    except Exception as e:
+        db.rollback(); print(f"Upload Job {job_id} Error: {e}")
+        _fail(db, job_id, token, "Failed to process CSV file.")
+    finally:
+        stop.set()
+        db.close()
+
+def _fail(db, job_id: int, token: str, message: str):
+    """Marks the job failed if this worker still owns it, and then deletes its spooled upload."""
+    failed = db.execute(
+        update(UploadJob).where(_owned(job_id, token))
+        .values(status="failed", last_error=message, finished_at=datetime.utcnow())
+    ).rowcount == 1
+    db.commit()
+    if failed:
+        file_path = db.query(UploadJob.file_path).filter(UploadJob.id == job_id).scalar()
+        try:
+            if file_path: os.remove(file_path)
+        except OSError as e:
+            print(f"Upload Job {job_id} Cleanup Error: {e}")
@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+import base64
+from datetime import datetime, timedelta
+
+from sqlalchemy import String, or_, select, type_coerce
+
+from models import Feedback
+
+# --- Feedback listing and export ---
+# Pages are addressed with a keyset cursor on (timestamp, id) rather than an
+# OFFSET, so fetching page 1000 costs the same index seek as page 1. Exports
+# stream rows from the database cursor and never build the whole response.
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_FETCH_SIZE = 1000
+EXPORT_COLUMNS = ["id", "timestamp", "user_text", "sentiment_label", "sentiment_prob",
+                  "urgency_label", "urgency_prob", "priority_action", "domain"]
+
+def _timestamp_key(db):
+    # SQLite stores timestamps as text in more than one format (server default
+    # vs. values written by Python), so the cursor compares the raw stored
+    # text, which is also what ORDER BY sorts on.
+    if db.get_bind().dialect.name == "sqlite":
+        return type_coerce(Feedback.timestamp, String)
+    return Feedback.timestamp
+
+def encode_cursor(timestamp, feedback_id: int) -> str:
+    value = timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+    return base64.urlsafe_b64encode(json.dumps([value, feedback_id]).encode()).decode()
+
+def decode_cursor(db, cursor: str) -> tuple:
+    """Raises ValueError on a malformed cursor."""
+    try:
+        value, feedback_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if db.get_bind().dialect.name != "sqlite":
+        value = datetime.fromisoformat(value)
+    return value, int(feedback_id)
+
+def _parse_day(value: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD") from None
+
+def filter_conditions(user_id, args) -> list:
+    """
+    Builds WHERE conditions from request args: sentiment, urgency, domain,
+    since and until (YYYY-MM-DD, both inclusive). Raises ValueError on bad dates.
+    """
+    conditions = [Feedback.user_id == user_id]
+    if args.get("sentiment"):
+        conditions.append(Feedback.sentiment_label == args["sentiment"])
+    if args.get("urgency"):
+        conditions.append(Feedback.urgency_label == args["urgency"])
+    if args.get("domain"):
+        conditions.append(Feedback.domain == args["domain"])
+    if args.get("since"):
+        conditions.append(Feedback.timestamp >= _parse_day(args["since"]))
+    if args.get("until"):
+        conditions.append(Feedback.timestamp < _parse_day(args["until"]) + timedelta(days=1))
+    return conditions
+
+def _serialize(row) -> dict:
+    item = {column: getattr(row, column) for column in EXPORT_COLUMNS}
+    item["timestamp"] = row.timestamp.strftime('%Y-%m-%d %H:%M:%S') if row.timestamp else None
+    return item
+
+def fetch_page(db, user_id, args, limit: int = DEFAULT_PAGE_SIZE, cursor: str = None) -> dict:
+    """Returns {'items': [...], 'next_cursor': str or None}, newest first."""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    timestamp_key = _timestamp_key(db)
+    conditions = filter_conditions(user_id, args)
+    if cursor:
+        after_timestamp, after_id = decode_cursor(db, cursor)
+        # The redundant upper bound gives the planner a range on
+        # (user_id, timestamp); a bare OR would scan from the top of the index.
+        conditions.append(timestamp_key <= after_timestamp)
+        conditions.append(or_(timestamp_key < after_timestamp, Feedback.id < after_id))
+    rows = db.execute(
+        select(*(getattr(Feedback, c) for c in EXPORT_COLUMNS), timestamp_key.label("timestamp_key"))
+        .where(*conditions)
+        .order_by(Feedback.timestamp.desc(), Feedback.id.desc())
+        .limit(limit + 1)
+    ).all()
+    next_cursor = encode_cursor(rows[limit - 1].timestamp_key, rows[limit - 1].id) if len(rows) > limit else None
+    return {"items": [_serialize(row) for row in rows[:limit]], "next_cursor": next_cursor}
+
+def export_stream(session_factory, user_id, args, fmt: str):
+    """
+    Returns a generator of CSV or NDJSON chunks for the filtered feedback,
+    newest first. Filters are validated here, before the response starts;
+    raises ValueError on bad ones.
+    """
+    return _iter_export(session_factory, filter_conditions(user_id, args), fmt)
+
+def _iter_export(session_factory, conditions: list, fmt: str):
+    # Opens its own session because the response body is produced after the
+    # view function has returned.
+    db = session_factory()
+    try:
+        result = db.execute(
+            select(*(getattr(Feedback, c) for c in EXPORT_COLUMNS))
+            .where(*conditions)
+            .order_by(Feedback.timestamp.desc(), Feedback.id.desc())
+            .execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE)
+        )
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+            writer.writeheader()
+            for rows in result.partitions():
+                writer.writerows(_serialize(row) for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0); buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield "".join(json.dumps(_serialize(row)) + "\n" for row in rows)
+    finally: db.close()
@@ -0,0 +1,90 @@
+import json
+import hashlib
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+import config
+from database import SessionLocal
+from instrumentation import inc
+from models import LLMCacheEntry
+
+# --- LLM response cache ---
+# Entries live in the llm_cache table so they are shared by all workers and
+# survive restarts. Keys hash the model name together with the exact prompt
+# input, entries expire after LLM_CACHE_TTL_SECONDS and the least recently
+# used ones are evicted beyond LLM_CACHE_MAX_ENTRIES.
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+def cache_key(model_name: str, prompt_input: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{prompt_input}".encode("utf-8")).hexdigest()
+
+def _count(name: str):
+    with _stats_lock:
+        _stats[name] += 1
+
+def get(model_name: str, prompt_input: str):
+    """Returns the cached value, or None on a miss or expired entry."""
+    key = cache_key(model_name, prompt_input)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        # TTL is checked in SQL: PostgreSQL returns timezone-aware datetimes, which can't be compared with utcnow()
+        entry = db.query(LLMCacheEntry).filter(
+            LLMCacheEntry.key == key,
+            LLMCacheEntry.created_at >= now - timedelta(seconds=config.LLM_CACHE_TTL_SECONDS),
+        ).first()
+        if entry is None:
+            _count("misses"); inc("llm_cache_lookups_total", result="miss")
+            return None
+        entry.last_used_at = now
+        db.commit()
+        _count("hits"); inc("llm_cache_lookups_total", result="hit")
+        return json.loads(entry.value)
+    finally: db.close()
+
+def put(model_name: str, prompt_input: str, value, tag: str = None):
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        db.merge(LLMCacheEntry(
+            key=cache_key(model_name, prompt_input), model=model_name, tag=tag,
+            value=json.dumps(value), created_at=now, last_used_at=now,
+        ))
+        _evict(db)
+        db.commit()
+    except Exception as e:
+        db.rollback(); print(f"LLM Cache Write Error: {e}")
+    finally: db.close()
+
+def _evict(db):
+    """Deletes expired entries and the least recently used ones beyond the size limit."""
+    expired_before = datetime.utcnow() - timedelta(seconds=config.LLM_CACHE_TTL_SECONDS)
+    db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.created_at < expired_before))
+    overflow = select(LLMCacheEntry.key).order_by(LLMCacheEntry.last_used_at.desc()).offset(config.LLM_CACHE_MAX_ENTRIES)
+    result = db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.key.in_(overflow)))
+    if result.rowcount:
+        with _stats_lock:
+            _stats["evictions"] += result.rowcount
+
+def invalidate_tag(db, tag: str):
+    """Drops all entries with `tag`. Does not commit, so it joins the caller's transaction."""
+    db.execute(delete(LLMCacheEntry).where(LLMCacheEntry.tag == tag))
+
+def themes_tag(user_id) -> str:
+    return f"themes:user:{user_id}"
+
+def stats() -> dict:
+    with _stats_lock:
+        counts = {name: _stats[name] for name in ("hits", "misses", "evictions")}
+    lookups = counts["hits"] + counts["misses"]
+    counts["hit_ratio"] = counts["hits"] / lookups if lookups else 0.0
+    db = SessionLocal()
+    try:
+        counts["entries"] = db.query(LLMCacheEntry).count()
+    finally: db.close()
+    return counts
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import config
+from instrumentation import inc, observe
+
+# --- Shared LLM client ---
+# One model object per process, a deadline on every call, a cap on in-flight
+# upstream requests and a circuit breaker. When the upstream is slow or
+# failing, callers get LLMUnavailable quickly and fall back to mock responses
+# instead of holding a gunicorn worker.
+
+class LLMUnavailable(Exception):
+    """The LLM call was rejected, timed out or failed; callers should use their fallback."""
+
+class GeminiBackend:
+    def __init__(self, model_name: str):
+        import google.generativeai as genai
+        genai.configure(api_key=os.environ.get("GOOGLE_API_KEY"))
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        response = self._model.generate_content(prompt, request_options={"timeout": timeout})
+        if not response.parts:
+            raise LLMUnavailable("Empty response from model")
+        return response.text
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_seconds`; then lets a single trial call through (half-open) and
+    closes again if it succeeds.
+    """
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half-open" if time.monotonic() - self._opened_at >= self.reset_seconds else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0; self._opened_at = None; self._trial_in_flight = False
+
+    def release_trial(self):
+        """The allowed call never reached the upstream; let the next one be the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+class LLMClient:
+    def __init__(self, backend, timeout: float, max_concurrency: int, breaker: CircuitBreaker):
+        self.backend = backend
+        self.timeout = timeout
+        self.breaker = breaker
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+
+    def generate(self, prompt: str) -> str:
+        """
+        Runs one generation within the client's deadline.
+
+        Raises:
+            LLMUnavailable: If the breaker is open, no slot frees up in time,
+                the deadline passes or the backend raises.
+        """
+        if not self.breaker.allow():
+            inc("llm_errors_total", reason="breaker_open")
+            raise LLMUnavailable("Circuit breaker is open")
+        started = time.monotonic()
+        deadline = started + self.timeout
+        if not self._slots.acquire(timeout=self.timeout):
+            # Local saturation says nothing about upstream health, so it doesn't count against the breaker
+            self.breaker.release_trial()
+            inc("llm_errors_total", reason="concurrency")
+            raise LLMUnavailable("Too many concurrent LLM calls")
+        # The slot is held until the upstream call really finishes, even if we
+        # stop waiting for it, so abandoned calls still count against the cap.
+        future = self._executor.submit(self.backend.generate, prompt, self.timeout)
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            text = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            self.breaker.record_failure()
+            inc("llm_errors_total", reason="timeout")
+            observe("llm_request_seconds", time.monotonic() - started, outcome="timeout")
+            raise LLMUnavailable(f"LLM call exceeded {self.timeout}s deadline")
+        except Exception as e:
+            self.breaker.record_failure()
+            inc("llm_errors_total", reason="error")
+            observe("llm_request_seconds", time.monotonic() - started, outcome="error")
+            raise LLMUnavailable(str(e)) from e
+        self.breaker.record_success()
+        observe("llm_request_seconds", time.monotonic() - started, outcome="ok")
+        return text
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client(model_name: str) -> LLMClient:
+    """Returns the process-wide client, building the Gemini model on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = build_client(GeminiBackend(model_name))
+        return _client
+
+def build_client(backend) -> LLMClient:
+    return LLMClient(
+        backend,
+        timeout=config.LLM_TIMEOUT_SECONDS,
+        max_concurrency=config.LLM_MAX_CONCURRENCY,
+        breaker=CircuitBreaker(config.LLM_BREAKER_FAILURES, config.LLM_BREAKER_RESET_SECONDS),
+    )
+
+def set_client(client):
+    """Replaces the process-wide client, e.g. with one wrapping a fake backend."""
+    global _client
+    with _client_lock:
+        _client = client
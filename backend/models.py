@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, func, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, Date, DateTime, LargeBinary, func, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -32,7 +32,92 @@ class Feedback(Base):
     priority_action = Column(String)
     domain = Column(String, default="general")
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    agent_insight = Column(Text)  # Stored AI recommendation, filled on demand or in bulk
+    agent_insight_at = Column(DateTime(timezone=True))
+    text_hash = Column(String)  # sha1 of the normalized text; keys text_embeddings
+    cluster_id = Column(Integer, ForeignKey("issue_clusters.id"), index=True)
     
     user_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="feedbacks")
 
+    __table_args__ = (
+        # Dashboard queries filter by user and order by time...
+        Index("ix_feedback_user_timestamp", "user_id", "timestamp"),
+        # ...or select on the labels (e.g. Negative + High for the critical list)
+        Index("ix_feedback_user_labels", "user_id", "sentiment_label", "urgency_label", "timestamp"),
+    )
+
+
+class UploadJob(Base):
+    __tablename__ = "upload_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    domain = Column(String, default="general")
+    filename = Column(String)
+    file_path = Column(String, nullable=False)
+    status = Column(String, default="queued", index=True)  # queued | running | done | failed
+    rows_read = Column(Integer, default=0)   # CSV rows consumed up to the last committed chunk
+    rows_done = Column(Integer, default=0)   # Feedback rows inserted
+    errors = Column(Integer, default=0)
+    cache_hits = Column(Integer, default=0)  # rows scored from the dedup cache
+    last_error = Column(String)
+    claim_token = Column(String)  # set by the worker that claimed the job; fences its progress updates
+    processing_seconds = Column(Float, default=0.0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    heartbeat_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+
+class MetricsDaily(Base):
+    """Per user/domain/day counters, maintained incrementally by ingestion (see rollup.py)."""
+    __tablename__ = "metrics_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    domain = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    positive = Column(Integer, nullable=False, default=0)
+    negative = Column(Integer, nullable=False, default=0)
+    high = Column(Integer, nullable=False, default=0)
+    medium = Column(Integer, nullable=False, default=0)
+    low = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+
+class LLMCacheEntry(Base):
+    """Cached LLM output keyed by a hash of the model name and prompt input (see llm_cache.py)."""
+    __tablename__ = "llm_cache"
+
+    key = Column(String, primary_key=True)
+    model = Column(String, nullable=False)
+    tag = Column(String, index=True)  # e.g. "themes:user:<id>", used for targeted invalidation
+    value = Column(Text, nullable=False)  # JSON-encoded result
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class TextEmbedding(Base):
+    """Pooled encoder embedding of a distinct normalized text, shared by all rows and users."""
+    __tablename__ = "text_embeddings"
+
+    text_hash = Column(String, primary_key=True)
+    vector = Column(LargeBinary, nullable=False)  # L2-normalized float16
+
+class IssueCluster(Base):
+    """A user's group of similar feedback, updated incrementally as rows are ingested (see clustering.py)."""
+    __tablename__ = "issue_clusters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    centroid = Column(LargeBinary, nullable=False)  # L2-normalized float32
+    size = Column(Integer, nullable=False, default=0)
+    representative_text = Column(String)
+    representative_similarity = Column(Float)  # cosine similarity of the representative to the centroid
+    updated_at = Column(DateTime(timezone=True))
+
+class WeeklyDigest(Base):
+    """Materialized weekly digest per user, produced by digest.py and served as-is."""
+    __tablename__ = "weekly_digests"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    week_start = Column(Date, primary_key=True)  # Monday (UTC) of the digested week
+    payload = Column(Text, nullable=False)  # JSON document returned by /api/digest
+    generated_at = Column(DateTime(timezone=True), nullable=False)
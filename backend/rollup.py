@@ -0,0 +1,105 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import func, case, delete, select, insert
+
+from models import Feedback, MetricsDaily
+
+# --- Metrics rollup ---
+# metrics_daily holds one row of counters per (user, domain, day). Ingestion
+# adds each chunk's counts in the same transaction as its inserts, so the
+# dashboard reads O(days) rollup rows instead of scanning the feedback table.
+
+KEY_COLUMNS = ("user_id", "domain", "day")
+COUNTER_COLUMNS = ("total", "positive", "negative", "high", "medium", "low", "score_sum")
+
+def _signed_score(label: str, prob: float) -> float:
+    return prob if label == "Positive" else -prob if label == "Negative" else 0.0
+
+def _upsert_statement(db):
+    """Returns an INSERT that adds to the counters of an existing rollup row."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(MetricsDaily)
+    return stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={name: getattr(MetricsDaily, name) + stmt.excluded[name] for name in COUNTER_COLUMNS},
+    )
+
+def apply_feedback_rows(db, rows: list, day):
+    """
+    Adds a batch of newly inserted feedback rows to the rollup.
+
+    Does not commit; call it inside the transaction that inserts the rows.
+
+    Args:
+        db: An open Session.
+        rows: Feedback mappings (user_id, domain, sentiment/urgency labels and probs).
+        day: The date the rows were stamped with.
+    """
+    totals = defaultdict(lambda: dict.fromkeys(COUNTER_COLUMNS, 0))
+    for row in rows:
+        counters = totals[(int(row["user_id"]), row["domain"])]
+        counters["total"] += 1
+        counters["positive"] += row["sentiment_label"] == "Positive"
+        counters["negative"] += row["sentiment_label"] == "Negative"
+        counters["high"] += row["urgency_label"] == "High"
+        counters["medium"] += row["urgency_label"] == "Medium"
+        counters["low"] += row["urgency_label"] == "Low"
+        counters["score_sum"] += _signed_score(row["sentiment_label"], row["sentiment_prob"])
+    if totals:
+        db.execute(_upsert_statement(db), [
+            dict(user_id=user_id, domain=domain, day=day, **counters)
+            for (user_id, domain), counters in totals.items()
+        ])
+
+def _count_if(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+def rebuild(db, user_id=None):
+    """Recomputes the rollup from the feedback table, for one user or for everyone."""
+    day = func.date(Feedback.timestamp)
+    source = select(
+        Feedback.user_id,
+        func.coalesce(Feedback.domain, "general"),
+        day,
+        func.count(Feedback.id),
+        _count_if(Feedback.sentiment_label == "Positive"),
+        _count_if(Feedback.sentiment_label == "Negative"),
+        _count_if(Feedback.urgency_label == "High"),
+        _count_if(Feedback.urgency_label == "Medium"),
+        _count_if(Feedback.urgency_label == "Low"),
+        func.sum(case(
+            (Feedback.sentiment_label == "Positive", Feedback.sentiment_prob),
+            (Feedback.sentiment_label == "Negative", -Feedback.sentiment_prob),
+            else_=0.0,
+        )),
+    ).where(Feedback.user_id.is_not(None)).group_by(Feedback.user_id, func.coalesce(Feedback.domain, "general"), day)
+    clear = delete(MetricsDaily)
+    if user_id is not None:
+        source = source.where(Feedback.user_id == user_id)
+        clear = clear.where(MetricsDaily.user_id == user_id)
+    db.execute(clear)
+    db.execute(insert(MetricsDaily).from_select(list(KEY_COLUMNS + COUNTER_COLUMNS), source))
+    db.commit()
+
+def backfill_if_empty(db):
+    """Builds the rollup for databases that already had feedback before it existed."""
+    if db.query(MetricsDaily.user_id).first() is None and db.query(Feedback.id).first() is not None:
+        rebuild(db)
+
+if __name__ == "__main__":
+    from database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild the metrics_daily rollup from the feedback table.")
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's rows.")
+    args = parser.parse_args()
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rebuild(db, args.user_id)
+        print(f"Rebuilt metrics rollup ({db.query(MetricsDaily).count()} rows).")
+    finally: db.close()
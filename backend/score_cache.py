@@ -0,0 +1,137 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import config
+from instrumentation import inc
+
+# --- Scoring dedup cache ---
+# Helpdesk exports repeat the same complaints over and over. Texts are keyed
+# on a normalized form (case folded, whitespace collapsed) and their sentiment
+# and urgency results are kept in a bounded in-memory LRU, optionally backed
+# by a SQLite file shared by all workers and uploads (SCORE_CACHE_PATH).
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+class LRUCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class SQLiteStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._connection().execute(
+            "CREATE TABLE IF NOT EXISTS score_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+
+    def _connection(self):
+        if getattr(self._local, "connection", None) is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return self._local.connection
+
+    def get_many(self, keys: list) -> dict:
+        found = {}
+        # Stay well under SQLite's bound-parameter limit
+        for start in range(0, len(keys), 500):
+            part = keys[start:start + 500]
+            rows = self._connection().execute(
+                f"SELECT key, value FROM score_cache WHERE key IN ({','.join('?' * len(part))})", part
+            ).fetchall()
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def put_many(self, items: dict):
+        self._connection().executemany(
+            "INSERT OR REPLACE INTO score_cache (key, value) VALUES (?, ?)",
+            [(key, json.dumps(value)) for key, value in items.items()],
+        )
+
+_memory = LRUCache(config.SCORE_CACHE_MAX_ENTRIES)
+_store = None
+_store_lock = threading.Lock()
+
+def _persistent_store():
+    global _store
+    if not config.SCORE_CACHE_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteStore(config.SCORE_CACHE_PATH)
+    return _store
+
+def cached_scores(namespace: str, texts: list, compute) -> tuple:
+    """
+    Scores `texts`, running `compute` only for normalized texts not seen before.
+
+    Args:
+        namespace: Identifies the scorer (sentiment model and backend) so
+            results from different scorers never mix.
+        texts: The input strings.
+        compute: Callable (list of texts) -> list of results, one per text.
+
+    Returns:
+        (results in the order of `texts`, number of texts served from the cache).
+        Each result is a fresh copy, so callers may mutate it. Results marked
+        'fallback' (the scorer failed) are returned but never cached.
+    """
+    keys = [f"{namespace}\0{normalize(text)}" for text in texts]
+    known = {}
+    for key in dict.fromkeys(keys):
+        value = _memory.get(key)
+        if value is not None:
+            known[key] = value
+
+    store = _persistent_store()
+    missing = [key for key in dict.fromkeys(keys) if key not in known]
+    if store is not None and missing:
+        try:
+            stored = store.get_many(missing)
+        except sqlite3.Error as e:
+            print(f"Score Cache Read Error: {e}"); stored = {}
+        for key, value in stored.items():
+            _memory.put(key, value)
+        known.update(stored)
+
+    # Score one representative text per new key
+    representatives = {}
+    for key, text in zip(keys, texts):
+        if key not in known:
+            representatives.setdefault(key, text)
+    if representatives:
+        computed = dict(zip(representatives, compute(list(representatives.values()))))
+        cacheable = {key: value for key, value in computed.items() if not value.get("fallback")}
+        for key, value in cacheable.items():
+            _memory.put(key, value)
+        if store is not None and cacheable:
+            try:
+                store.put_many(cacheable)
+            except sqlite3.Error as e:
+                print(f"Score Cache Write Error: {e}")
+        known.update(computed)
+
+    cache_name = namespace.split(":", 1)[0]
+    inc("score_cache_lookups_total", len(texts) - len(representatives), cache=cache_name, result="hit")
+    inc("score_cache_lookups_total", len(representatives), cache=cache_name, result="miss")
+    return [dict(known[key]) for key in keys], len(texts) - len(representatives)
@@ -1,32 +1,152 @@
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import os
+import json
+import base64
+import time
 import logging
+import threading
+import urllib.request
+
+import config
+from instrumentation import inc, observe, timed
 
 # --- Model Initialization ---
+# transformers and torch are imported on first use rather than at module
+# import, so routes that never score text don't pay for them. Under gunicorn
+# the model can instead be loaded once in the master (see gunicorn.conf.py)
+# and shared with the workers through copy-on-write.
 
 # This model is specifically fine-tuned for sentiment analysis on social media text.
 MODEL_NAME = "cardiffnlp/twitter-roberta-base-sentiment-latest"
 LABELS = ["Negative", "Neutral", "Positive"]
+# Returned when the model is unavailable or a batch fails; flagged so the dedup cache never keeps it
+FALLBACK_RESULT = {"label": "Neutral", "prob": 0.5, "fallback": True}
+
+# --- Inference backends ---
+# SENTIMENT_BACKEND selects how the classifier runs on CPU. All backends take
+# the tokenizer's output and return per-row class probabilities in LABELS order,
+# plus, when asked for, the mean-pooled last hidden state of each row, which
+# clustering.py uses as the text's embedding (the encoder runs once for both).
+#   torch       the fp32 PyTorch model
+#   torch-int8  dynamic int8 quantization of the model's Linear layers
+#   onnx        an ONNX Runtime session, exported from the PyTorch model on first use
+# An ONNX Runtime session starts its intra-op thread pool when it is created,
+# and those threads don't exist in a forked child, so a session built in the
+# gunicorn master can hang the workers. Such backends are never preloaded;
+# each worker creates its own on first use.
+FORK_UNSAFE_BACKENDS = {"onnx"}
+
+def _mean_pool(hidden, attention_mask):
+    """Averages token states over the non-padding positions of each row."""
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    return (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1)
+
+class TorchBackend:
+    tensor_type = "pt"
+
+    def __init__(self, quantize: bool = False):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+        model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+        model.eval()
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+    def forward(self, inputs, with_embeddings: bool = False) -> tuple:
+        """Returns (probabilities as lists, pooled embeddings as a float32 array or None)."""
+        import torch
+        with torch.inference_mode():
+            # Hidden states of every layer are only kept when the embedding is needed
+            outputs = self.model(**inputs, output_hidden_states=with_embeddings)
+            pooled = _mean_pool(outputs.hidden_states[-1], inputs["attention_mask"]).float().numpy() if with_embeddings else None
+        return torch.softmax(outputs.logits, dim=1).tolist(), pooled
+
+class OnnxBackend:
+    tensor_type = "np"
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+        if not os.path.exists(path):
+            export_onnx(path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def forward(self, inputs, with_embeddings: bool = False) -> tuple:
+        import numpy as np
+        feed = {name: value.astype(np.int64) for name, value in inputs.items() if name in self.input_names}
+        outputs = self.session.run(["logits", "pooled"] if with_embeddings else ["logits"], feed)
+        logits = outputs[0]
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return (exp / exp.sum(axis=1, keepdims=True)).tolist(), outputs[1].astype(np.float32) if with_embeddings else None
+
+def export_onnx(path: str):
+    """Exports the PyTorch classifier to ONNX with dynamic batch and sequence axes."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
 
-# Use a global variable to cache the model and tokenizer so they are loaded only once.
+    class PooledClassifier(torch.nn.Module):
+        """Wraps the classifier so the graph outputs the pooled embedding next to the logits."""
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, output_hidden_states=True)
+            return outputs.logits, _mean_pool(outputs.hidden_states[-1], attention_mask)
+
+    logging.info(f"Exporting {MODEL_NAME} to ONNX at {path}...")
+    model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
+    model.eval()
+    sample = AutoTokenizer.from_pretrained(MODEL_NAME)(["export sample"], return_tensors="pt")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Export under a per-process name and rename, as several workers may export at once
+    partial = f"{path}.{os.getpid()}.tmp"
+    with torch.inference_mode():
+        torch.onnx.export(
+            PooledClassifier(model), (sample["input_ids"], sample["attention_mask"]), partial,
+            input_names=["input_ids", "attention_mask"], output_names=["logits", "pooled"],
+            dynamic_axes={"input_ids": {0: "batch", 1: "sequence"},
+                          "attention_mask": {0: "batch", 1: "sequence"},
+                          "logits": {0: "batch"}, "pooled": {0: "batch"}},
+            opset_version=14, dynamo=False,
+        )
+    os.replace(partial, path)
+
+def load_backend(name: str):
+    if name == "torch":
+        return TorchBackend()
+    if name == "torch-int8":
+        return TorchBackend(quantize=True)
+    if name == "onnx":
+        return OnnxBackend(config.SENTIMENT_ONNX_PATH)
+    raise ValueError(f"Unknown SENTIMENT_BACKEND '{name}' (expected torch, torch-int8 or onnx)")
+
+# Use a global variable to cache the tokenizer and backend so they are loaded only once.
 tokenizer = None
-model = None
+backend = None
+_model_lock = threading.Lock()
 
 def initialize_model():
-    """Loads the tokenizer and model into memory. Catches potential errors."""
-    global tokenizer, model
-    if tokenizer is None or model is None:
-        try:
-            logging.info(f"Loading sentiment analysis model: {MODEL_NAME}...")
-            tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-            model = AutoModelForSequenceClassification.from_pretrained(MODEL_NAME)
-            logging.info("Sentiment analysis model loaded successfully.")
-        except Exception as e:
-            logging.error(f"Failed to load sentiment model: {e}")
-            # In a real app, you might have a fallback mechanism here.
-            raise e
+    """Loads the tokenizer and the configured backend into memory. Catches potential errors."""
+    global tokenizer, backend
+    if tokenizer is not None and backend is not None:
+        return
+    with _model_lock:
+        if tokenizer is None or backend is None:
+            try:
+                from transformers import AutoTokenizer
+                logging.info(f"Loading sentiment analysis model: {MODEL_NAME} ({config.SENTIMENT_BACKEND} backend)...")
+                tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+                backend = load_backend(config.SENTIMENT_BACKEND)
+                logging.info("Sentiment analysis model loaded successfully.")
+            except Exception as e:
+                logging.error(f"Failed to load sentiment model: {e}")
+                # In a real app, you might have a fallback mechanism here.
+                raise e
 
-# --- Analysis Function ---
+# --- Analysis Functions ---
 
 def analyze_sentiment(text: str) -> dict:
     """
@@ -39,33 +159,100 @@ def analyze_sentiment(text: str) -> dict:
         A dictionary containing the predicted 'label' and 'prob' (probability).
         Returns a default neutral score if the model is not loaded.
     """
-    # Ensure model is loaded before first use
+    return analyze_sentiment_batch([text])[0]
+
+# --- Inference server client ---
+# When INFERENCE_SERVER_URL points at inference_server.py, texts are scored
+# there so all web workers share one model and its micro-batches. If the
+# server can't be reached we score in-process and leave it alone for
+# INFERENCE_RETRY_SECONDS before trying again.
+
+_server_down_until = 0.0
+
+def encode_embedding(vector) -> str:
+    """Packs an embedding as base64 float16 for JSON transport."""
+    import numpy as np
+    return base64.b64encode(np.asarray(vector, dtype=np.float16).tobytes()).decode("ascii")
+
+def decode_embedding(encoded: str):
+    import numpy as np
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.float16).astype(np.float32)
+
+def _analyze_remote(texts: list, with_embeddings: bool = False) -> list:
+    request = urllib.request.Request(
+        config.INFERENCE_SERVER_URL.rstrip("/") + "/predict",
+        data=json.dumps({"texts": texts, "embeddings": with_embeddings}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=config.INFERENCE_TIMEOUT_SECONDS) as response:
+        payload = json.load(response)
+    if not payload.get("success") or len(payload["results"]) != len(texts):
+        raise ValueError(payload.get("error", "Malformed response from inference server"))
+    results = payload["results"]
+    for result in results:
+        if "embedding" in result:
+            result["embedding"] = decode_embedding(result["embedding"])
+    return results
+
+def analyze_sentiment_batch(texts: list, batch_size: int = 32, with_embeddings: bool = False) -> list:
+    """
+    Analyzes the sentiment of many texts, on the inference server if one is
+    configured and in-process otherwise. See analyze_sentiment_batch_local.
+    """
+    global _server_down_until
+    if config.INFERENCE_SERVER_URL and texts and time.monotonic() >= _server_down_until:
+        try:
+            return _analyze_remote(texts, with_embeddings)
+        except Exception as e:
+            logging.warning(f"Inference server unavailable, scoring in-process: {e}")
+            _server_down_until = time.monotonic() + config.INFERENCE_RETRY_SECONDS
+    return analyze_sentiment_batch_local(texts, batch_size=batch_size, with_embeddings=with_embeddings)
+
+def analyze_sentiment_batch_local(texts: list, batch_size: int = 32, with_embeddings: bool = False) -> list:
+    """
+    Analyzes the sentiment of many texts using batched forward passes.
+
+    Texts are sorted by length so each batch is padded only up to its own
+    longest member, which keeps wasted compute on padding tokens low.
+
+    Args:
+        texts: The input strings to analyze.
+        batch_size: Maximum number of texts per forward pass.
+        with_embeddings: Also return each text's pooled encoder embedding.
+
+    Returns:
+        A list of {'label', 'prob'} dictionaries in the same order as `texts`,
+        with an 'embedding' float32 array when requested and the model ran.
+        Fallback results (model unavailable or batch failed) carry 'fallback': True.
+    """
     initialize_model()
 
-    if not model or not tokenizer:
+    if not backend or not tokenizer:
         logging.warning("Sentiment model not available. Returning neutral.")
-        return {"label": "Neutral", "prob": 0.5}
-
-    try:
-        # Tokenize the text and prepare it for the model
-        inputs = tokenizer(text, return_tensors="pt", truncation=True, max_length=512)
-        
-        # Get model predictions
-        outputs = model(**inputs)
-        
-        # Apply softmax to convert logits to probabilities
-        scores = torch.softmax(outputs.logits, dim=1)
-        
-        # Get the index of the highest probability score
-        max_idx = torch.argmax(scores)
-        
-        return {
-            "label": LABELS[max_idx],
-            "prob": float(scores[0][max_idx])
-        }
-    except Exception as e:
-        logging.error(f"Error during sentiment analysis for text '{text[:50]}...': {e}")
-        return {"label": "Neutral", "prob": 0.5}
-
-# Initialize the model when the application starts
-initialize_model()
+        return [dict(FALLBACK_RESULT) for _ in texts]
+    return score_with_backend(backend, texts, batch_size, with_embeddings)
+
+def score_with_backend(scoring_backend, texts: list, batch_size: int = 32, with_embeddings: bool = False) -> list:
+    """Runs `texts` through a specific backend; see analyze_sentiment_batch_local."""
+    results = [None] * len(texts)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    for start in range(0, len(order), batch_size):
+        batch_idx = order[start:start + batch_size]
+        batch = [texts[i] for i in batch_idx]
+        try:
+            with timed("tokenize"):
+                inputs = tokenizer(batch, return_tensors=scoring_backend.tensor_type, padding=True, truncation=True, max_length=512)
+            with timed("model_forward"):
+                batch_probs, pooled = scoring_backend.forward(inputs, with_embeddings)
+            observe("sentiment_batch_size", len(batch))
+            inc("sentiment_texts_total", len(batch))
+            for row, (i, probs) in enumerate(zip(batch_idx, batch_probs)):
+                label_idx = max(range(len(LABELS)), key=probs.__getitem__)
+                results[i] = {"label": LABELS[label_idx], "prob": float(probs[label_idx])}
+                if with_embeddings:
+                    results[i]["embedding"] = pooled[row]
+        except Exception as e:
+            logging.error(f"Error during batched sentiment analysis ({len(batch)} texts): {e}")
+            for i in batch_idx:
+                results[i] = dict(FALLBACK_RESULT)
+    return results
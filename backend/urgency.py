@@ -1,26 +1,107 @@
-def analyze_urgency(text):
-    text_lower = text.lower()
-    if any(k in text_lower for k in ["urgent", "immediately", "asap", "emergency", "critical", "now"]):
-        return {"label": "High", "prob": 0.92}
-    elif any(k in text_lower for k in ["soon", "quickly", "please help", "important"]):
-        return {"label": "Medium", "prob": 0.78}
-    else:
-        return {"label": "Low", "prob": 0.65}
+import re
+import json
+
+import config
+
+# --- Keyword rule engine ---
+# Urgency levels and domain escalations are keyword rules loaded from
+# RULES_PATH (rules.json). All keywords are compiled into one regex, so
+# a text is scanned once and every label is derived from the set of keywords
+# it contains. Keywords match at the start of a word and may be followed by
+# any suffix ("refund" matches "refunded"), but not mid-word ("now" does not
+# match "know").
+
+def _load_rules(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        rules = json.load(f)
+    for rule in rules["urgency"] + list(rules["domains"].values()):
+        rule["keywords"] = [k.lower() for k in rule["keywords"]]
+    return rules
+
+RULES = _load_rules(config.RULES_PATH)
+
+def _trie_pattern(keywords) -> str:
+    """
+    Builds a regex alternation factored as a trie ("re(?:fund|ceived)" rather
+    than "refund|received"), so each text position is tested one character at
+    a time instead of once per keyword.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+def _compile(rules: dict) -> tuple:
+    keywords = {k for level in rules["urgency"] for k in level["keywords"]}
+    keywords |= {k for domain in rules["domains"].values() for k in domain["keywords"]}
+    first_chars = re.escape("".join(sorted({k[0] for k in keywords})))
+    # re.ASCII keeps \b cheap; keywords are plain ASCII words
+    pattern = re.compile(rf"\b(?=[{first_chars}])(?:{_trie_pattern(keywords)})", re.ASCII)
+    # A match consumes its text, so keywords that occur inside a longer keyword
+    # (e.g. "help" inside "please help") are credited whenever the longer one matches.
+    implied = {k: {other for other in keywords if re.search(r"\b" + re.escape(other), k)} for k in keywords}
+    return pattern, implied
+
+_PATTERN, _IMPLIED = _compile(RULES)
+# keyword -> index of the most urgent level it belongs to, and -> domains it escalates
+_KEYWORD_LEVEL = {}
+for _index, _level in reversed(list(enumerate(RULES["urgency"]))):
+    _KEYWORD_LEVEL.update(dict.fromkeys(_level["keywords"], _index))
+_KEYWORD_DOMAINS = {}
+for _name, _domain in RULES["domains"].items():
+    for _keyword in _domain["keywords"]:
+        _KEYWORD_DOMAINS.setdefault(_keyword, set()).add(_name)
+
+def match_keywords(text: str) -> list:
+    """Returns the sorted list of rule keywords found in `text` (one regex pass)."""
+    hits = _PATTERN.findall(text.lower())
+    if not hits:
+        return []
+    found = set()
+    for keyword in hits:
+        found |= _IMPLIED[keyword]
+    return sorted(found)
+
+def _normalize_domain(domain_type: str) -> str:
+    # The upload form sends "e-commerce"; the rules use "ecommerce"
+    return (domain_type or "general").lower().replace("-", "")
+
+def urgency_from_matches(matches) -> dict:
+    levels = [_KEYWORD_LEVEL[k] for k in matches if k in _KEYWORD_LEVEL]
+    if levels:
+        level = RULES["urgency"][min(levels)]
+        return {"label": level["label"], "prob": level["prob"]}
+    return dict(RULES["default_urgency"])
+
+def priority_from_matches(matches, sentiment: dict, urgency: dict, domain_type: str) -> tuple:
+    """Applies the domain escalation to `urgency` (in place) and picks the priority action."""
+    domain_name = _normalize_domain(domain_type)
+    if any(domain_name in _KEYWORD_DOMAINS.get(k, ()) for k in matches):
+        domain = RULES["domains"][domain_name]
+        urgency["label"] = domain["label"]; urgency["prob"] = domain["prob"]
 
-def apply_domain_rules(text, sentiment, urgency, domain_type):
-    text_lower = text.lower()
-    if domain_type == "banking" and any(k in text_lower for k in ["otp", "transaction failed", "account locked", "fraud"]):
-        urgency["label"] = "High"; urgency["prob"] = 0.95
-    elif domain_type == "healthcare" and any(k in text_lower for k in ["pain", "emergency", "appointment", "medication"]):
-        urgency["label"] = "High"; urgency["prob"] = 0.95
-    elif domain_type == "ecommerce" and any(k in text_lower for k in ["refund", "delivery", "not received", "damaged"]):
-        urgency["label"] = "High"; urgency["prob"] = 0.92
-    
     if sentiment["label"] == "Negative" and urgency["label"] == "High":
         priority_action = "escalate-to-human"
     elif urgency["label"] == "Medium":
         priority_action = "monitor-and-review"
     else:
         priority_action = "auto-respond"
-    
+
     return urgency, priority_action
+
+def analyze_urgency(text):
+    return urgency_from_matches(match_keywords(text))
+
+def apply_domain_rules(text, sentiment, urgency, domain_type):
+    return priority_from_matches(match_keywords(text), sentiment, urgency, domain_type)
@@ -0,0 +1,62 @@
+"""
+Reports how issue clustering (backend/clustering.py) splits a CSV of
+feedback with the real sentiment model: the spread of pairwise cosine
+similarities with raw and with mean-centred embeddings, and the cluster
+sizes one user ends up with for each similarity threshold. Use it to pick
+CLUSTER_SIMILARITY_THRESHOLD for your data.
+
+Usage (from the project root):
+    python benchmarks/bench_clustering.py [--csv data/feedback_final.csv] [--thresholds 0.3 0.4 0.5 0.6]
+"""
+import argparse
+import csv
+import os
+import tempfile
+
+import numpy as np
+
+from synthetic import make_session
+
+import config
+import clustering
+
+def load_texts(path: str) -> list:
+    with open(path, newline='', encoding='utf-8') as f:
+        return [r['feedback'] for r in csv.DictReader(f) if r.get('feedback')]
+
+def pairwise(vectors) -> str:
+    sims = (vectors @ vectors.T)[np.triu_indices(len(vectors), k=1)]
+    p10, p50, p90 = np.percentile(sims, [10, 50, 90])
+    return f"p10={p10:.3f} median={p50:.3f} p90={p90:.3f}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default=os.path.join(config.BASE_DIR, 'data', 'feedback_final.csv'))
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.3, 0.4, 0.5, 0.6, 0.7])
+    parser.add_argument("--chunk-size", type=int, default=config.UPLOAD_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    texts = list(dict.fromkeys(load_texts(args.csv)))
+    hashes = [clustering.text_hash(t) for t in texts]
+    embedded = [(h, t, v) for h, t, v in zip(hashes, texts, clustering.embed_texts(texts)) if v is not None]
+    raw = np.stack([v for _, _, v in embedded])
+    print(f"texts={len(embedded)} dims={raw.shape[1]}")
+    print(f"pairwise cosine, raw:     {pairwise(raw)}")
+    print(f"pairwise cosine, centred: {pairwise(clustering._unit_rows(raw - raw.mean(axis=0)))}")
+
+    for threshold in args.thresholds:
+        config.CLUSTER_SIMILARITY_THRESHOLD = threshold
+        clustering._baseline = None
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, Session = make_session(os.path.join(tmp, "bench.db"))
+            db = Session()
+            for start in range(0, len(embedded), args.chunk_size):
+                chunk = embedded[start:start + args.chunk_size]
+                clustering.assign_clusters(db, 1, [(h, t) for h, t, _ in chunk], {h: v for h, _, v in chunk})
+                db.commit()
+            sizes = [c["size"] for c in clustering.top_clusters(db, 1, limit=config.CLUSTER_MAX_PER_USER)]
+            print(f"threshold={threshold:.2f} clusters={len(sizes)} sizes={sizes}")
+            db.close(); engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Times weekly digest generation (backend/digest.py) on a database with many
+users: the full batched run, a rerun after half of the digests were lost
+(only those are rebuilt), a forced regeneration, and the /api/digest lookup
+against computing the live dashboard payload per request.
+
+Usage (from the project root):
+    python benchmarks/bench_digest.py --users 5000 --rows 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from synthetic import make_session, populate_feedback
+
+from models import IssueCluster, WeeklyDigest
+from rollup import rebuild
+from dashboard import build_metrics
+from digest import generate_digests, get_digest, last_complete_week
+
+CLUSTERS_PER_USER = 5
+
+def add_clusters(db, users: int):
+    """Gives every user a few issue clusters and spreads their rows over them."""
+    db.bulk_insert_mappings(IssueCluster, [
+        dict(id=(uid - 1) * CLUSTERS_PER_USER + k + 1, user_id=uid, centroid=b"", size=0,
+             representative_text=f"issue {k} of user {uid}", representative_similarity=1.0)
+        for uid in range(1, users + 1) for k in range(CLUSTERS_PER_USER)
+    ])
+    db.execute(text(f"UPDATE feedback SET cluster_id = (user_id - 1) * {CLUSTERS_PER_USER} + id % {CLUSTERS_PER_USER} + 1"))
+    db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--lookups", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        populate_feedback(engine, args.rows, users=args.users, days=21)
+        db = Session()
+        rebuild(db)
+        add_clusters(db, args.users)
+        start = last_complete_week()
+
+        started = time.perf_counter()
+        written = generate_digests(db, start, batch_size=args.batch_size)
+        full_s = time.perf_counter() - started
+        print(f"users={args.users} rows={args.rows} week={start.isoformat()}")
+        print(f"full run:   {written:>6} digests in {full_s:.2f}s ({written / full_s:.0f} users/sec)")
+
+        # Simulate a run that died halfway: drop every other digest and rerun
+        db.execute(text("DELETE FROM weekly_digests WHERE user_id % 2 = 0")); db.commit()
+        started = time.perf_counter()
+        resumed = generate_digests(db, start, batch_size=args.batch_size)
+        print(f"resumed:    {resumed:>6} digests in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        forced = generate_digests(db, start, force=True, batch_size=args.batch_size)
+        print(f"forced:     {forced:>6} digests in {time.perf_counter() - started:.2f}s")
+        assert db.query(WeeklyDigest).count() == written, "digest upsert is not idempotent"
+
+        lookup_users = [uid % args.users + 1 for uid in range(args.lookups)]
+        started = time.perf_counter()
+        for uid in lookup_users:
+            get_digest(db, uid, start)
+        lookup_ms = (time.perf_counter() - started) / args.lookups * 1000
+        started = time.perf_counter()
+        for uid in lookup_users[:100]:
+            build_metrics(db, uid)
+        live_ms = (time.perf_counter() - started) / min(args.lookups, 100) * 1000
+        print(f"per request: digest lookup {lookup_ms:.2f} ms, live dashboard build {live_ms:.2f} ms")
+        db.close(); engine.dispose()
+
+if __name__ == "__main__":
+    main()
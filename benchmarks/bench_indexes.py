@@ -0,0 +1,73 @@
+"""
+Shows SQLite query plans and timings for the dashboard queries on a
+feedback table without the composite indexes, then applies them through
+database.upgrade_schema() (the migration path used for existing
+databases) and repeats the measurements.
+
+Usage (from the project root):
+    python benchmarks/bench_indexes.py --rows 500000 --users 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import text
+
+from synthetic import make_session, populate_feedback
+
+from models import Feedback
+from database import upgrade_schema
+import dashboard
+
+def plan(db, query) -> str:
+    compiled = query.statement.compile(db.bind, compile_kwargs={"literal_binds": True})
+    rows = db.execute(text(f"EXPLAIN QUERY PLAN {compiled}")).all()
+    return "; ".join(row[-1] for row in rows)
+
+def timed_ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def report(db, label: str):
+    critical = db.query(Feedback).filter(
+        Feedback.user_id == 1, Feedback.sentiment_label == "Negative", Feedback.urgency_label == "High",
+    ).order_by(Feedback.timestamp.desc()).limit(10)
+    recent = db.query(Feedback.user_text).filter(Feedback.user_id == 1).order_by(Feedback.timestamp.desc()).limit(50)
+    print(f"--- {label} ---")
+    print(f"critical plan: {plan(db, critical)}")
+    print(f"recent plan:   {plan(db, recent)}")
+    print(f"critical_feedback{timed_ms(lambda: dashboard.critical_feedback(db, 1)):8.2f} ms")
+    print(f"recent_texts     {timed_ms(lambda: dashboard.recent_feedback_texts(db, 1)):8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        with engine.begin() as conn:
+            for index in Feedback.__table__.indexes:
+                if index.name.startswith("ix_feedback_user_"):
+                    index.drop(bind=conn)
+        populate_feedback(engine, args.rows, users=args.users)
+        db = Session()
+        report(db, f"before ({args.rows} rows, {args.users} users)")
+        db.close()
+
+        started = time.perf_counter()
+        upgrade_schema(engine)
+        print(f"upgrade_schema took {time.perf_counter() - started:.1f}s")
+        db = Session()
+        db.execute(text("ANALYZE"))
+        report(db, "after")
+        db.close()
+
+if __name__ == "__main__":
+    main()
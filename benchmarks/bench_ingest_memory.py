@@ -0,0 +1,111 @@
+"""
+Streams a synthetic CSV of the requested size through the upload ingestion
+pipeline into a temporary SQLite database and checks that peak RSS stays
+under a ceiling, independent of file size.
+
+By default rows are scored with a constant stub (and a pseudo-random
+embedding per text, so issue clustering still runs) so the run measures the
+pipeline itself; pass --with-model to score with the sentiment model.
+
+Usage (from the project root):
+    python benchmarks/bench_ingest_memory.py --size-mb 300 --max-rss-growth-mb 150
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import numpy as np
+
+from models import Base, UploadJob
+from ingest import ingest_job
+from clustering import text_hash
+
+WORDS = ("app crashing login slow refund payment great update support screen "
+         "urgent please help delivery damaged love easy broken issue account").split()
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def write_csv(path: str, size_mb: int, seed: int = 0) -> int:
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    rows = written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        written += f.write("feedback\n")
+        while written < target:
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40)))
+            written += f.write(f'"{text}, ünïcode ✓"\n')
+            rows += 1
+    return rows
+
+def stub_embedding(row_hash: str):
+    return np.random.default_rng(int(row_hash[:8], 16)).standard_normal(768).astype(np.float32)
+
+def stub_score_chunk(texts, domain, user_id):
+    rows = []
+    for t in texts:
+        row_hash = text_hash(t)
+        rows.append(dict(user_text=t, sentiment_label="Neutral", sentiment_prob=0.5, urgency_label="Low",
+                         urgency_prob=0.65, priority_action="auto-respond", domain=domain, user_id=user_id,
+                         text_hash=row_hash, _embedding=stub_embedding(row_hash)))
+    return rows, 0
+
+def model_score_chunk(texts, domain, user_id):
+    from sentiment import analyze_sentiment_batch
+    from urgency import analyze_urgency, apply_domain_rules
+    rows = []
+    for text, sentiment in zip(texts, analyze_sentiment_batch(texts, with_embeddings=True)):
+        urgency, priority_action = apply_domain_rules(text, sentiment, analyze_urgency(text), domain)
+        rows.append(dict(user_text=text, sentiment_label=sentiment["label"], sentiment_prob=sentiment["prob"],
+                         urgency_label=urgency["label"], urgency_prob=urgency["prob"],
+                         priority_action=priority_action, domain=domain, user_id=user_id,
+                         text_hash=text_hash(text), _embedding=sentiment.get("embedding")))
+    return rows, 0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=300)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--max-rss-growth-mb", type=float, default=150.0)
+    parser.add_argument("--with-model", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "upload.csv")
+        rows = write_csv(csv_path, args.size_mb)
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        job = UploadJob(user_id=1, domain="general", filename="upload.csv", file_path=csv_path,
+                        status="running", rows_read=0, rows_done=0, errors=0, cache_hits=0, processing_seconds=0.0)
+        db.add(job); db.commit()
+
+        score_chunk = model_score_chunk if args.with_model else stub_score_chunk
+        baseline = peak_rss_mb()
+        started = time.perf_counter()
+        with open(csv_path, 'rb') as f:
+            ingest_job(db, job, f, score_chunk, args.chunk_size)
+        elapsed = time.perf_counter() - started
+        growth = peak_rss_mb() - baseline
+        rows_done = job.rows_done  # the last commit expired the instance; load it while the session is open
+        db.close()
+
+    print(f"file={args.size_mb} MB rows={rows} inserted={rows_done} time={elapsed:.1f}s "
+          f"({rows / elapsed:.0f} rows/sec)")
+    print(f"peak RSS growth during ingestion: {growth:.1f} MB (ceiling {args.max_rss_growth_mb} MB)")
+    if growth > args.max_rss_growth_mb:
+        sys.exit("FAIL: peak RSS ceiling exceeded")
+    print("OK")
+
+if __name__ == "__main__":
+    main()
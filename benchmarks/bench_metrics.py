@@ -0,0 +1,66 @@
+"""
+Compares /api/metrics aggregation latency: the previous approach (load every
+Feedback row and count in Python) against backend/dashboard.py, which reads
+the metrics_daily rollup. Also reports how long a full rollup rebuild takes.
+
+Usage (from the project root):
+    python benchmarks/bench_metrics.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from synthetic import make_session, populate_feedback
+
+from models import Feedback
+from dashboard import build_metrics
+from rollup import rebuild
+
+def legacy_metrics(db, user_id):
+    all_feedback = db.query(Feedback).filter(Feedback.user_id == user_id).order_by(Feedback.timestamp.desc()).all()
+    total = len(all_feedback)
+    positive = sum(1 for f in all_feedback if f.sentiment_label == "Positive")
+    negative = sum(1 for f in all_feedback if f.sentiment_label == "Negative")
+    high = sum(1 for f in all_feedback if f.urgency_label == "High")
+    medium = sum(1 for f in all_feedback if f.urgency_label == "Medium")
+    low = sum(1 for f in all_feedback if f.urgency_label == "Low")
+    score_sum = sum(f.sentiment_prob if f.sentiment_label == 'Positive' else -f.sentiment_prob if f.sentiment_label == 'Negative' else 0 for f in all_feedback)
+    critical = [f.id for f in all_feedback if f.sentiment_label == "Negative" and f.urgency_label == "High"][:10]
+    today = datetime.utcnow().date()
+    by_date = Counter(f.timestamp.date() for f in all_feedback)
+    trend = [by_date.get(today - timedelta(days=i), 0) for i in range(29, -1, -1)]
+    return total, positive, negative, high, medium, low, score_sum, critical, trend
+
+def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy ms':>12} {'rollup ms':>10} {'speedup':>8} {'rebuild s':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine, Session = make_session(os.path.join(tmp, "bench.db"))
+            populate_feedback(engine, size)
+            db = Session()
+            started = time.perf_counter()
+            rebuild(db)
+            rebuild_s = time.perf_counter() - started
+            legacy = timed(lambda: (legacy_metrics(db, 1), db.expunge_all()), args.repeat)
+            rollup = timed(lambda: build_metrics(db, 1), args.repeat)
+            db.close(); engine.dispose()
+        print(f"{size:>10} {legacy:>12.1f} {rollup:>10.1f} {legacy / rollup:>7.1f}x {rebuild_s:>10.1f}")
+
+if __name__ == "__main__":
+    main()
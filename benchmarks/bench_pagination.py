@@ -0,0 +1,63 @@
+"""
+Compares page latency at increasing depth for keyset (cursor) pagination in
+backend/listing.py against naive LIMIT/OFFSET paging, and times a full
+NDJSON export stream.
+
+Usage (from the project root):
+    python benchmarks/bench_pagination.py --rows 1000000 --page-size 50
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from synthetic import make_session, populate_feedback
+
+from models import Feedback
+from listing import fetch_page, encode_cursor, export_stream, _timestamp_key
+
+def offset_page(db, offset: int, limit: int):
+    return db.query(Feedback).filter(Feedback.user_id == 1).order_by(
+        Feedback.timestamp.desc(), Feedback.id.desc()).offset(offset).limit(limit).all()
+
+def cursor_at(db, offset: int) -> str:
+    """Cursor positioned just before row `offset`, as a client would hold after paging there."""
+    row = db.query(_timestamp_key(db), Feedback.id).filter(Feedback.user_id == 1).order_by(
+        Feedback.timestamp.desc(), Feedback.id.desc()).offset(offset - 1).limit(1).one()
+    return encode_cursor(row[0], row[1])
+
+def timed_ms(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_session(os.path.join(tmp, "bench.db"))
+        populate_feedback(engine, args.rows)
+        db = Session()
+        print(f"{'offset':>10} {'OFFSET ms':>10} {'keyset ms':>10}")
+        offset = args.page_size
+        while offset < args.rows:
+            cursor = cursor_at(db, offset)
+            naive = timed_ms(lambda: (offset_page(db, offset, args.page_size), db.expunge_all()))
+            keyset = timed_ms(lambda: fetch_page(db, 1, {}, limit=args.page_size, cursor=cursor))
+            print(f"{offset:>10} {naive:>10.2f} {keyset:>10.2f}")
+            offset *= 10
+        db.close()
+
+        started = time.perf_counter()
+        size = sum(len(chunk) for chunk in export_stream(Session, 1, {}, "ndjson"))
+        elapsed = time.perf_counter() - started
+        print(f"ndjson export: {args.rows} rows, {size / 1e6:.1f} MB in {elapsed:.1f}s ({args.rows / elapsed:.0f} rows/sec)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Compares the sentiment backends (torch, torch-int8, onnx): label agreement
+with the fp32 torch backend on data/feedback_final.csv, the largest
+probability difference, load time and batched throughput on CPU.
+
+The onnx backend needs onnxruntime installed and exports the model to
+SENTIMENT_ONNX_PATH on first use.
+
+Usage (from the project root):
+    python benchmarks/bench_sentiment_backends.py --rows 512 --batch-size 32
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import config
+import sentiment
+
+def load_texts() -> list:
+    with open(os.path.join(config.BASE_DIR, 'data', 'feedback_final.csv'), newline='', encoding='utf-8') as f:
+        return [r['feedback'] for r in csv.DictReader(f) if r.get('feedback')]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=["torch", "torch-int8", "onnx"])
+    parser.add_argument("--rows", type=int, default=512, help="Rows scored for the throughput figure.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+    sentiment.tokenizer = AutoTokenizer.from_pretrained(sentiment.MODEL_NAME)
+    texts = load_texts()
+    corpus = [texts[i % len(texts)] for i in range(args.rows)]
+
+    reference = None
+    print(f"{'backend':>11} {'load s':>7} {'agree':>7} {'max dprob':>10} {'rows/sec':>9}")
+    for name in args.backends:
+        started = time.perf_counter()
+        try:
+            backend = sentiment.load_backend(name)
+        except ImportError as e:
+            print(f"{name:>11} skipped: {e}")
+            continue
+        load_s = time.perf_counter() - started
+        results = sentiment.score_with_backend(backend, texts, args.batch_size)
+        if reference is None:
+            reference = results
+        agree = sum(r["label"] == ref["label"] for r, ref in zip(results, reference)) / len(texts)
+        max_diff = max(abs(r["prob"] - ref["prob"]) for r, ref in zip(results, reference) if r["label"] == ref["label"])
+
+        sentiment.score_with_backend(backend, corpus[:args.batch_size], args.batch_size)  # warm-up
+        started = time.perf_counter()
+        sentiment.score_with_backend(backend, corpus, args.batch_size)
+        rows_per_sec = len(corpus) / (time.perf_counter() - started)
+        print(f"{name:>11} {load_s:>7.1f} {agree:>7.1%} {max_diff:>10.4f} {rows_per_sec:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Measures sentiment scoring throughput (rows/sec) on CPU for the per-row
+path and for batched inference at several batch sizes.
+
+Usage (from the project root):
+    python benchmarks/bench_sentiment_batch.py --rows 512 --batch-sizes 1 8 16 32 64
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+import torch
+import config
+from sentiment import analyze_sentiment, analyze_sentiment_batch
+
+def load_texts(rows: int) -> list:
+    path = os.path.join(config.BASE_DIR, 'data', 'feedback_final.csv')
+    with open(path, newline='', encoding='utf-8') as f:
+        base = [r['feedback'] for r in csv.DictReader(f) if r.get('feedback')]
+    return [base[i % len(base)] for i in range(rows)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32, 64])
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    texts = load_texts(args.rows)
+    analyze_sentiment_batch(texts[:8])  # warm-up
+
+    print(f"rows={len(texts)} torch_threads={torch.get_num_threads()}")
+    start = time.perf_counter()
+    for text in texts:
+        analyze_sentiment(text)
+    elapsed = time.perf_counter() - start
+    print(f"{'per-row':>12}: {len(texts) / elapsed:8.1f} rows/sec")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        analyze_sentiment_batch(texts, batch_size=batch_size)
+        elapsed = time.perf_counter() - start
+        print(f"{'batch=' + str(batch_size):>12}: {len(texts) / elapsed:8.1f} rows/sec")
+
+if __name__ == "__main__":
+    main()
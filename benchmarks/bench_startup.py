@@ -0,0 +1,116 @@
+"""
+Starts the app under gunicorn with the repo's gunicorn.conf.py and reports
+time-to-first-request, time until the first uploaded row is scored, and the
+RSS / PSS of every worker (PSS splits shared pages between the processes
+that map them, so it shows how much of the model is actually shared). The
+server runs against a throwaway database and upload directory.
+
+Run it once with the default preloaded master and once with
+--no-preload to compare against lazy per-worker loading. --backend onnx
+checks that workers answer when the master must not build the ONNX
+Runtime session (the model then loads in each worker on first use).
+
+Usage (from the project root):
+    python benchmarks/bench_startup.py [--no-preload] [--workers 2] [--backend onnx]
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def wait_for(url: str, timeout: float) -> float:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter() - started
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+def memory_mb(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = int(rest.split()[0]) / 1024
+    return values
+
+def children(pid: int) -> list:
+    pids = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    return pids
+
+def upload_and_wait(base: str, timeout: float) -> float:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"userId\"\r\n\r\n1\r\n"
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"probe.csv\"\r\n"
+        f"Content-Type: text/csv\r\n\r\nfeedback\r\nThe app keeps crashing, please fix asap\r\n"
+        f"--{boundary}--\r\n"
+    ).encode()
+    started = time.perf_counter()
+    request = urllib.request.Request(f"{base}/api/upload_csv", data=body,
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    job_id = json.load(urllib.request.urlopen(request))["job_id"]
+    while time.perf_counter() - started < timeout:
+        job = json.load(urllib.request.urlopen(f"{base}/api/upload_jobs/{job_id}?userId=1"))["job"]
+        if job["status"] in ("done", "failed"):
+            return time.perf_counter() - started
+        time.sleep(0.1)
+    raise TimeoutError("upload job did not finish")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--no-preload", action="store_true", help="Lazy model loading in each worker.")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--backend", choices=["torch", "torch-int8", "onnx"], default=None,
+                        help="SENTIMENT_BACKEND for the server (default: from the environment).")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(args.workers),
+                   DATABASE_URL=f"sqlite:///{os.path.join(tmp, 'bench.db')}", UPLOAD_DIR=os.path.join(tmp, "uploads"))
+        command = [sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py")]
+        if args.no_preload:
+            env["PRELOAD_APP"] = "0"
+        if args.backend:
+            env["SENTIMENT_BACKEND"] = args.backend
+        started = time.perf_counter()
+        server = subprocess.Popen(command, cwd=ROOT, env=env)
+        try:
+            base = f"http://127.0.0.1:{port}"
+            wait_for(f"{base}/about", args.timeout)
+            print(f"mode={'lazy' if args.no_preload else 'preloaded master'} workers={args.workers} backend={env.get('SENTIMENT_BACKEND', 'torch')}")
+            print(f"time to first request: {time.perf_counter() - started:.2f}s")
+            print(f"time to first scored row (after first request): {upload_and_wait(base, args.timeout):.2f}s")
+            master = memory_mb(server.pid)
+            print(f"master   pid={server.pid} rss={master['rss']:.0f} MB pss={master['pss']:.0f} MB")
+            for pid in children(server.pid):
+                worker = memory_mb(pid)
+                print(f"worker   pid={pid} rss={worker['rss']:.0f} MB pss={worker['pss']:.0f} MB")
+        finally:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
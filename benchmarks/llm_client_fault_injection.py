@@ -0,0 +1,104 @@
+"""
+Exercises backend/llm_client.py against a local fake backend that injects
+latency and failures: per-call deadlines, the concurrency cap and the
+circuit breaker. Needs no network access or API key.
+
+Usage (from the project root):
+    python benchmarks/llm_client_fault_injection.py
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from llm_client import LLMClient, CircuitBreaker, LLMUnavailable
+
+class FakeBackend:
+    """Stands in for GeminiBackend; sleeps `latency` seconds and optionally raises."""
+    def __init__(self, latency: float = 0.0, fail: bool = False):
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, timeout: float) -> str:
+        with self._lock:
+            self.calls += 1; self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            if self.fail:
+                raise RuntimeError("injected upstream failure")
+            return f"echo: {prompt}"
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+def client_for(backend, timeout=0.2, max_concurrency=2, failures=3, reset=0.5):
+    return LLMClient(backend, timeout=timeout, max_concurrency=max_concurrency,
+                     breaker=CircuitBreaker(failures, reset))
+
+def call(client, prompt="hi"):
+    started = time.perf_counter()
+    try:
+        result = client.generate(prompt)
+    except LLMUnavailable as e:
+        result = e
+    return result, time.perf_counter() - started
+
+def check_fast_path():
+    result, _ = call(client_for(FakeBackend(latency=0.01)))
+    assert result == "echo: hi", result
+    print("fast backend: ok")
+
+def check_deadline():
+    result, elapsed = call(client_for(FakeBackend(latency=2.0), timeout=0.2))
+    assert isinstance(result, LLMUnavailable) and elapsed < 0.5, (result, elapsed)
+    print(f"slow backend: gave up after {elapsed:.2f}s")
+
+def check_concurrency_cap():
+    backend = FakeBackend(latency=0.1)
+    client = client_for(backend, timeout=1.0, max_concurrency=2)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: call(client)[0], range(8)))
+    assert backend.max_in_flight <= 2, backend.max_in_flight
+    assert all(r == "echo: hi" for r in results), results
+    print(f"concurrency cap: max in flight {backend.max_in_flight}")
+
+def check_saturation_keeps_breaker_closed():
+    backend = FakeBackend(latency=0.3)
+    client = client_for(backend, timeout=0.05, max_concurrency=1, failures=2)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda _: call(client)[0], range(6)))
+    rejected = sum(isinstance(r, LLMUnavailable) for r in results)
+    assert rejected >= 5 and client.breaker.state == "closed", (rejected, client.breaker.state)
+    print(f"local saturation: {rejected} calls rejected, breaker still closed")
+
+def check_circuit_breaker():
+    backend = FakeBackend(fail=True)
+    client = client_for(backend, failures=3, reset=0.3)
+    for _ in range(3):
+        call(client)
+    assert client.breaker.state == "open"
+    result, elapsed = call(client)
+    assert isinstance(result, LLMUnavailable) and backend.calls == 3 and elapsed < 0.01
+    print(f"breaker open: rejected in {elapsed * 1000:.2f} ms without calling upstream")
+
+    time.sleep(0.35)
+    backend.fail = False
+    result, _ = call(client)
+    assert result == "echo: hi" and client.breaker.state == "closed"
+    print("breaker half-open trial succeeded: closed again")
+
+if __name__ == "__main__":
+    check_fast_path()
+    check_deadline()
+    check_concurrency_cap()
+    check_saturation_keeps_breaker_closed()
+    check_circuit_breaker()
+    print("OK")
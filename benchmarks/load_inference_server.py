@@ -0,0 +1,106 @@
+"""
+Load-tests the sentiment inference server: for each concurrency level,
+client threads send /predict requests back to back for a fixed duration,
+then p50/p99 request latency and throughput are reported.
+
+Starts its own server (python backend/inference_server.py) unless --url is given.
+
+Usage (from the project root):
+    python benchmarks/load_inference_server.py --concurrency 1 4 16 64 --duration 20
+    python benchmarks/load_inference_server.py --max-batch 32 --max-wait-ms 5
+"""
+import argparse
+import csv
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def load_texts() -> list:
+    with open(os.path.join(ROOT, 'data', 'feedback_final.csv'), newline='', encoding='utf-8') as f:
+        return [r['feedback'] for r in csv.DictReader(f) if r.get('feedback')]
+
+def predict(url: str, texts: list):
+    request = urllib.request.Request(f"{url}/predict", data=json.dumps({"texts": texts}).encode(),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=120) as response:
+        json.load(response)
+
+def wait_healthy(url: str, timeout: float = 600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/health", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError("inference server did not start")
+
+def run_level(url: str, concurrency: int, duration: float, texts: list, per_request: int) -> dict:
+    latencies, lock = [], threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(worker: int):
+        i = worker
+        while time.monotonic() < stop_at:
+            payload = [texts[(i + k) % len(texts)] for k in range(per_request)]
+            started = time.perf_counter()
+            predict(url, payload)
+            with lock:
+                latencies.append(time.perf_counter() - started)
+            i += concurrency
+
+    threads = [threading.Thread(target=client, args=(w,)) for w in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "rows_per_sec": len(latencies) * per_request / elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=None, help="Use an already running server.")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--texts-per-request", type=int, default=1)
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([
+            sys.executable, os.path.join(ROOT, "backend", "inference_server.py"), "--port", str(args.port),
+            "--max-batch", str(args.max_batch), "--max-wait-ms", str(args.max_wait_ms), "--threads", str(args.threads),
+        ], cwd=os.path.join(ROOT, "backend"))
+    try:
+        wait_healthy(url)
+        texts = load_texts()
+        predict(url, texts[:4])  # warm-up
+        print(f"{'concurrency':>11} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9} {'rows/sec':>9}")
+        for concurrency in args.concurrency:
+            r = run_level(url, concurrency, args.duration, texts, args.texts_per_request)
+            print(f"{concurrency:>11} {r['requests']:>9} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['rows_per_sec']:>9.1f}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
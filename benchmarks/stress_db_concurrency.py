@@ -0,0 +1,101 @@
+"""
+Concurrency stress test against a local SQLite database: several writer
+threads insert feedback chunks (Core executemany + rollup upsert, as
+ingestion does) while reader threads load the dashboard and page through
+feedback. Reports throughput and every error; exits non-zero on any
+"database is locked" or other failure.
+
+--plain uses a bare create_engine() (rollback journal, no busy timeout)
+to show what the engine settings in database.make_engine() fix.
+
+Usage (from the project root):
+    python benchmarks/stress_db_concurrency.py --writers 4 --readers 8 --duration 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Feedback
+from database import make_engine
+from rollup import apply_feedback_rows
+from dashboard import build_metrics
+from listing import fetch_page
+
+def writer(Session, stop_at: float, chunk: int, stats: Counter, errors: list, seed: int):
+    rng = random.Random(seed)
+    while time.monotonic() < stop_at:
+        db = Session()
+        try:
+            now = datetime.utcnow()
+            rows = [dict(user_text=f"stress row {rng.random()}", sentiment_label=rng.choice(["Positive", "Neutral", "Negative"]),
+                         sentiment_prob=rng.random(), urgency_label=rng.choice(["High", "Medium", "Low"]),
+                         urgency_prob=rng.random(), priority_action="auto-respond", domain="general",
+                         user_id=rng.randint(1, 5), timestamp=now) for _ in range(chunk)]
+            db.execute(insert(Feedback.__table__), rows)
+            apply_feedback_rows(db, rows, now.date())
+            db.commit()
+            stats["write_txns"] += 1; stats["rows_written"] += chunk
+        except Exception as e:
+            db.rollback(); errors.append(f"writer: {e.__class__.__name__}: {e}")
+        finally: db.close()
+
+def reader(Session, stop_at: float, stats: Counter, errors: list, seed: int):
+    rng = random.Random(seed)
+    while time.monotonic() < stop_at:
+        db = Session()
+        try:
+            user_id = rng.randint(1, 5)
+            build_metrics(db, user_id)
+            fetch_page(db, user_id, {}, limit=50)
+            stats["reads"] += 1
+        except Exception as e:
+            errors.append(f"reader: {e.__class__.__name__}: {e}")
+        finally: db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--chunk", type=int, default=256)
+    parser.add_argument("--plain", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        uri = f"sqlite:///{os.path.join(tmp, 'stress.db')}"
+        engine = create_engine(uri, connect_args={"check_same_thread": False}) if args.plain else make_engine(uri)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        stats, errors = Counter(), []
+        stop_at = time.monotonic() + args.duration
+        threads = [threading.Thread(target=writer, args=(Session, stop_at, args.chunk, stats, errors, i))
+                   for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(Session, stop_at, stats, errors, 1000 + i))
+                    for i in range(args.readers)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        engine.dispose()
+
+    print(f"engine={'plain' if args.plain else 'make_engine (WAL)'} writers={args.writers} readers={args.readers}")
+    print(f"write txns/sec: {stats['write_txns'] / args.duration:.1f} ({stats['rows_written'] / args.duration:.0f} rows/sec)")
+    print(f"reads/sec:      {stats['reads'] / args.duration:.1f}")
+    print(f"errors:         {len(errors)}")
+    for message, count in Counter(errors).most_common(5):
+        print(f"  {count}x {message}")
+    if errors:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
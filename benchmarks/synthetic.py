@@ -0,0 +1,46 @@
+"""Helpers shared by the benchmark scripts to build throwaway databases of synthetic feedback."""
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'backend'))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Feedback
+
+SENTIMENTS = ["Positive", "Neutral", "Negative"]
+URGENCIES = ["High", "Medium", "Low"]
+DOMAINS = ["general", "banking", "healthcare", "ecommerce"]
+TEXTS = [
+    "The app keeps crashing when I open settings, please fix asap",
+    "Love the new update, much faster than before",
+    "Refund not received after two weeks, this is urgent",
+    "Login is slow and confusing on mobile",
+    "Great support experience, thanks team",
+    "Transaction failed twice and my account is locked",
+]
+
+def make_session(path: str, create_schema: bool = True):
+    """Returns (engine, Session factory) for a SQLite database at `path`."""
+    engine = create_engine(f"sqlite:///{path}")
+    if create_schema:
+        Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(bind=engine)
+
+def populate_feedback(engine, rows: int, users: int = 1, days: int = 90, seed: int = 0, batch: int = 50_000):
+    """Inserts `rows` random Feedback rows spread over `users` users and the last `days` days."""
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        for start in range(0, rows, batch):
+            conn.execute(insert(Feedback), [
+                dict(user_text=rng.choice(TEXTS), sentiment_label=rng.choice(SENTIMENTS),
+                     sentiment_prob=rng.uniform(0.4, 1.0), urgency_label=rng.choice(URGENCIES),
+                     urgency_prob=rng.uniform(0.6, 0.95), priority_action="auto-respond",
+                     domain=rng.choice(DOMAINS), user_id=rng.randint(1, users),
+                     timestamp=now - timedelta(seconds=rng.randint(0, days * 86400)))
+                for _ in range(min(batch, rows - start))
+            ])
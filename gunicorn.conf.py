@@ -0,0 +1,32 @@
+import gc
+import os
+
+# The backend modules import each other by bare name (from database import ...),
+# so run from the backend folder.
+chdir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+# Synchronous LLM work is budgeted to fit inside this (LLM_BULK_BUDGET_SECONDS)
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+
+# Import the app (and load the sentiment model) once in the master; forked
+# workers share the weights copy-on-write instead of each loading their own.
+# With INFERENCE_SERVER_URL set the master skips the model (workers score remotely).
+# Set PRELOAD_APP=0 to fall back to lazy loading in each worker.
+os.environ.setdefault("PRELOAD_APP", "1")
+preload_app = os.environ["PRELOAD_APP"] == "1"
+
+def when_ready(server):
+    # Move everything allocated so far out of the collector's generations so
+    # GC passes in the workers don't write to (and un-share) those pages.
+    gc.freeze()
+
+def post_fork(server, worker):
+    if not server.cfg.preload_app:
+        return
+    # Connections and threads from the master are not usable in the child.
+    import database
+    import jobs
+    database.engine.dispose(close=False)
+    jobs.start_workers()